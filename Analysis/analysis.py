@@ -1,6 +1,3 @@
-# import cPickle as pickle
-import pickle
-from glob import glob
 import pandas as pd
 import seaborn as sns
 import sys
@@ -10,20 +7,27 @@ import np
 import numpy as np
 
 sys.path.append('../SRN')
-from network import Network  # for pickle
+import experiment
+import store
 
 sns.set(context='notebook', style='whitegrid', palette='muted', font_scale=1.2)
 sns.plt.switch_backend('TkAgg')  # MacOS backend doesn't work as well
 
 
+RESULTS_DIR = '../SRN/results'
+# Store columns with other names than the columns here (experiment A is the
+# contoid language, B the vocoid language).
+STORE_COLUMNS = {'contoid_errors': 'exp_a_errors', 'vocoid_errors': 'exp_b_errors'}
+
+
 def create_csv(file_name='net-log.csv', columns=None, rounding=3):
-    """Creates a .csv file for all nets in nets/ with parameters and results"""
+    """Creates a .csv file for all nets in the results store with parameters and results"""
     df = get_data_frame(columns=columns)
     df.to_csv(file_name, index=False)
 
 
 def get_data_frame(columns=None):
-    """Returns a pandas data frame for nets in ../SRN/nets/"""
+    """Returns a pandas data frame for the nets in the results store"""
 
     default_cols = ['time', 'lang', 'distributed', 'seed', 'word_F',
                     'contoid_accuracy', 'vocoid_accuracy']
@@ -43,15 +47,10 @@ def get_data_frame(columns=None):
         cols = default_cols + columns
         cols = sorted(cols, key=all_cols.index)
 
-    d = {col: [] for col in cols}  
-    # for each net, append each attribute to the respective column
-    for net_file in glob('../SRN/nets/*.p'):
-        net = pickle.load(open(net_file))
-        for attr in d.keys():
-            d[attr].append(getattr(net, attr, None))
-
-    df = pd.DataFrame.from_dict(d)
-    df = df.reindex_axis(cols, axis=1)
+    # Only the requested columns are read from the results store.
+    table = store.read_table(RESULTS_DIR, [STORE_COLUMNS.get(col, col) for col in cols])
+    df = pd.DataFrame({col: list(table[STORE_COLUMNS.get(col, col)]) for col in cols},
+                      columns=cols)
     return df
 
 
@@ -115,72 +114,17 @@ def plot_word_segmentation(df):
 
 
 
-def update_accuracies(df):
-    def errors_to_accuracy(errors):
-        def get_network_choices(trial_errors, use_sigmoid=True, k=7):
-            """Returns ([int], [float]): choices and reaction time
-            choices is a list of 0 or 1 corresponding to word indices in one trial
-            reaction time is a list of floats
-
-            Args:
-              trial_errors [(float, float)]: each tuple represents
-                the reaction times for the two words in a trial
-            """
-            def sigmoid(t):
-                return 1 / (1 + np.e ** (-k * t))
-
-            def percent_difference(a, b):
-                return (a - b)/ ((a + b) / 2)
-                
-            # pairs of consecutive words correspond to trials
-            def choose(pair):
-                if use_sigmoid:
-                    p_first = sigmoid(percent_difference(pair[1], pair[0]))
-                else:
-                    p_first = pair[1] / (pair[1] + pair[0])
-
-                choice = 0 if random.random() < p_first else 1
-                rt = 1 / (abs(pair[0]-pair[1])/(sum(pair)/2)) 
-                return (choice, rt)
-
-            results = [choose(p) for p in trial_errors]
-            choices = [r[0] for r in results]
-            reaction_times = [r[1] for r in results]
-            return choices, reaction_times
-
-
-        def get_correct_choices():
-            """Returns [int]: tuple index of correct word for each trial"""
-            with open('../SRN/experiment/answer-key.txt', 'r') as f:
-                key = f.read()
-            key = key.split('\r')
-            key = map(int, key)
-            return key
-
-
-        def test_word_choices(choices):
-            """Returns [int]: indices of trials net was incorrect for
-
-            Args:
-              choices: [int] network's word choices, 1 or 0"""
-            key = get_correct_choices()
-            assert len(choices) == len(key)
-            incorrect = []
-            for i in range(len(key)):
-                if choices[i] != key[i]:
-                    incorrect.append(i)
-            return incorrect
-
-        trial_errors = [(errors[i], errors[i+1]) for i in xrange(0, len(errors), 2)]
-        choices, reaction_times = get_network_choices(trial_errors)
-        incorrect = test_word_choices(choices)
-        accuracy = 1 - (float(len(incorrect)) / len(choices))
-        return accuracy
-
-    df['contoid_accuracy'] = df.apply(lambda row: errors_to_accuracy(
-                                      row['contoid_errors']), axis=1)
-    df['vocoid_accuracy'] = df.apply(lambda row: errors_to_accuracy(
-                                     row['vocoid_errors']), axis=1)
+def update_accuracies(df, k=7, seed=None):
+    """Sets the accuracy columns of df from one simulated subject per net.
+
+    The choices of every net are simulated in one call to
+    experiment.simulate_choices."""
+    key = experiment.get_correct_choices('../SRN/experiment/answer-key.txt')
+    for condition in ('contoid', 'vocoid'):
+        # Consecutive pairs of words are the two words of each trial.
+        errors = np.array(list(df[condition + '_errors']), dtype=float).reshape(len(df), -1, 2)
+        _, _, accuracy = experiment.simulate_choices(errors, k, seed=seed, key=key)
+        df[condition + '_accuracy'] = accuracy[:, 0]
 
 
 def print_aovs(df):
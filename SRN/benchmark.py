@@ -0,0 +1,286 @@
+"""Timing benchmarks for the numpy network backend"""
+from __future__ import division, print_function
+from collections import Counter
+import numpy as np
+
+import os
+import tempfile
+import joblib
+from types import SimpleNamespace
+
+import corpora
+import examples
+import main
+import segmentation
+import store
+import utils
+from network import Network
+from srn import SRN, as_matrix
+
+
+def get_examples(lang='english', num_examples=20000, distributed=True):
+    """Returns (inputs, targets) encoded from the start of a corpus."""
+    corpus = corpora.get_corpus(lang, word_boundaries=True)
+    phones = [phone for phone, _ in main.extract_boundaries(corpus[:2 * num_examples])]
+    inputs, targets = main.prepare(phones[:num_examples + 1], distributed)
+    return as_matrix(inputs), as_matrix(targets)
+
+
+def benchmark_streams(streams=(1, 2, 4, 8, 16, 32, 64), num_hidden=80, **kwargs):
+    """Prints training examples per second as the number of streams grows."""
+    inputs, targets = get_examples(**kwargs)
+    print('%8s %12s' % ('streams', 'examples/s'))
+    for num_streams in streams:
+        srn = SRN(inputs.shape[1], num_hidden, targets.shape[1])
+        with utils.Timer(print_func=None) as t:
+            srn.train(inputs, targets, num_streams)
+        print('%8d %12.0f' % (num_streams, len(inputs) / t.elapsed))
+
+
+def benchmark_sparse(num_examples=20000, num_hidden=80, num_streams=1, lang='english'):
+    """Prints localist training speed and input memory, one-hot vs. sparse."""
+    corpus = corpora.get_corpus(lang, word_boundaries=True)
+    phones = [phone for phone, _ in main.extract_boundaries(corpus[:2 * num_examples])]
+    phones = phones[:num_examples + 1]
+    num_units = len(corpora.get_alphabet())
+    print('%8s %12s %10s' % ('inputs', 'examples/s', 'input MB'))
+    for sparse in (False, True):
+        inputs, targets = main.prepare(phones, distributed=False, sparse=sparse)
+        srn = SRN(num_units, num_hidden, num_units)
+        with utils.Timer(print_func=None) as t:
+            srn.train(inputs, targets, num_streams)
+        print('%8s %12.0f %10.2f' % ('sparse' if sparse else 'one-hot',
+                                     len(inputs) / t.elapsed, inputs.nbytes / 1e6))
+
+
+def benchmark_outputs(inventory_sizes=(45, 200, 1000), num_examples=5000, num_hidden=80,
+                      num_streams=16):
+    """Prints training speed of each output layer as the inventory grows.
+
+    Uses random sparse examples; the hierarchical output gets about
+    sqrt(inventory size) classes of equal size."""
+    rng = np.random.RandomState(0)
+    print('%10s %14s %12s' % ('inventory', 'output', 'examples/s'))
+    for size in inventory_sizes:
+        inputs = rng.randint(size, size=num_examples)
+        targets = np.roll(inputs, -1)
+        classes = np.arange(size) % int(np.sqrt(size))
+        for output in ('logistic', 'softmax', 'hierarchical'):
+            srn = SRN(size, num_hidden, size, output=output, classes=classes)
+            with utils.Timer(print_func=None) as t:
+                srn.train(inputs, targets, num_streams)
+            print('%10d %14s %12.0f' % (size, output, num_examples / t.elapsed))
+
+
+def compare_precision(lang='english', num_train=100000, num_test=10000, seeds=(0, 1, 2),
+                      num_streams=1):
+    """Prints test error, segmentation and training speed of float32 nets.
+
+    Each seed is trained in float64 (the baseline) and in float32 on the
+    same localist corpus. The float32 net is also saved with float16
+    weights and loaded again, to measure the cost of compressing them.
+    """
+    train, test, test_bounds = main.get_corpora(lang, num_train, num_test, sparse=True)
+    columns = ['error_total', 'boundary_auc', 'boundary_F', 'word_F', 'examples/s', 'weights KB']
+    print('%5s %22s' % ('seed', 'precision') + ''.join('%13s' % c for c in columns))
+    directory = tempfile.mkdtemp()
+    for seed in seeds:
+        for dtype, weights_dtype in [('float64', None), ('float32', None),
+                                     ('float32', 'float16')]:
+            net = Network(seed, backend='numpy', num_streams=num_streams, dtype=dtype,
+                          weights_dtype=weights_dtype, distributed=False, sparse=True)
+            main.use_sparse_inputs(net)
+            with utils.Timer(print_func=None) as t:
+                net.fit(*train)
+            save_dir = os.path.join(directory, '%s_%s_%s' % (seed, dtype, weights_dtype))
+            net.save(save_dir)
+            net = Network.load(save_dir)
+
+            result = net.test(*test)
+            row = SimpleNamespace(test_bounds=test_bounds,
+                                  test_outputs=result['out_activations'])
+            scores = segmentation.segmentation(row)
+            values = [result['error_total'], scores['boundasy_auc'], scores['boundary_F'],
+                      scores['word_F'], len(train[0]) / t.elapsed,
+                      os.path.getsize(save_dir + '/weights.npz') / 1e3]
+            name = dtype + (' / %s file' % weights_dtype if weights_dtype else '')
+            print('%5d %22s' % (seed, name) + ''.join('%13.4f' % v for v in values))
+
+
+def test_boundary_prediction_counter(correct_boundaries, predicted_boundaries):
+    """The original segmentation.test_boundary_prediction, for comparison."""
+    result_map = {(True, True): 'hit',
+                  (True, False): 'alarm',
+                  (False, True): 'miss',
+                  (False, False): 'reject'}
+    results = Counter(result_map[(p, c)] for p, c in
+                      zip(predicted_boundaries, correct_boundaries))
+    if results['hit'] == 0:
+        return {'boundary_precision': 0, 'boundary_recall': 0, 'boundary_F': 0}
+    precision = results['hit'] / (results['hit'] + results['alarm'])
+    recall = results['hit'] / (results['hit'] + results['miss'])
+    return {'boundary_precision': precision,
+            'boundary_recall': recall,
+            'boundary_F': 2 * (precision * recall) / (precision+recall)}
+
+
+def test_word_segmentation_sets(correct_boundaries, predicted_boundaries):
+    """The original segmentation.test_word_segmentation, without its words.pkl dump."""
+    correct_indices = np.nonzero(correct_boundaries)[0]
+    predicted_indices = np.nonzero(predicted_boundaries)[0]
+    correct_words = set(map(tuple, utils.neighbors(correct_indices)))
+    predicted_words = set(map(tuple, utils.neighbors(predicted_indices)))
+    hits = len(correct_words & predicted_words)
+    alarms = len(predicted_words - correct_words)
+    misses = len(correct_words - predicted_words)
+    if hits == 0:
+        return {'word_precision': 0, 'word_recall': 0, 'word_F': 0}
+    precision = hits / (hits+alarms)
+    recall = hits / (hits+misses)
+    return {'word_precision': precision,
+            'word_recall': recall,
+            'word_F': 2 * (precision * recall) / (precision+recall)}
+
+
+def benchmark_segmentation(num_examples=100000, num_nets=100, boundary_rate=0.3):
+    """Prints the time to score many nets' boundary predictions.
+
+    Uses random boundaries and activations, and checks that every
+    implementation returns exactly the same results."""
+    rng = np.random.RandomState(0)
+    correct = rng.rand(num_examples) < boundary_rate
+    # Activations that are informative about the boundaries, as a net's are.
+    break_outs = (0.5 * correct[:, None] + rng.rand(num_examples, num_nets)).astype(np.float32)
+
+    def score_counter_sets():
+        results = []
+        for net in range(num_nets):
+            predicted = segmentation.get_predicted_word_boundaries(break_outs[:, net])
+            results.append(dict(test_boundary_prediction_counter(correct, predicted),
+                                **test_word_segmentation_sets(correct, predicted)))
+        return results
+
+    def score_arrays():
+        results = []
+        for net in range(num_nets):
+            predicted = segmentation.get_predicted_word_boundaries(break_outs[:, net])
+            results.append(dict(segmentation.score_boundaries(correct, [predicted])[0],
+                                **segmentation.score_words(correct, [predicted])[0]))
+        return results
+
+    def score_batch():
+        return segmentation.score_segmentations(correct, break_outs)
+
+    print('%22s %10s' % ('scoring', 'seconds'))
+    reference = None
+    for name, score in [('Counter and sets', score_counter_sets),
+                        ('arrays, one net', score_arrays),
+                        ('arrays, batch', score_batch)]:
+        with utils.Timer(print_func=None) as t:
+            results = score()
+        print('%22s %10.3f' % (name, t.elapsed))
+        reference = reference or results
+        assert results == reference, '%s results differ' % name
+
+
+def benchmark_threshold_sweep(num_examples=100000, num_thresholds=(10, 100, 1000),
+                              boundary_rate=0.3):
+    """Prints the time to score boundary thresholds one at a time and in one sweep."""
+    rng = np.random.RandomState(0)
+    correct = rng.rand(num_examples) < boundary_rate
+    break_out = (0.5 * correct + rng.rand(num_examples)).astype(np.float32)
+
+    with utils.Timer(print_func=None) as t:
+        sweep = segmentation.threshold_sweep(correct, break_out)
+    print('one sweep over %d thresholds: %.3f seconds' % (len(sweep['threshold']), t.elapsed))
+    print('%12s %10s' % ('thresholds', 'seconds'))
+    for num in num_thresholds:
+        thresholds = sweep['threshold'][np.linspace(0, len(sweep['threshold']) - 1, num,
+                                                    dtype=int)]
+        with utils.Timer(print_func=None) as t:
+            for threshold in thresholds:
+                predicted = [break_out > threshold]
+                segmentation.score_boundaries(correct, predicted)
+                segmentation.score_words(correct, predicted)
+                segmentation.metrics.roc_auc_score(correct, break_out)
+        print('%12d %10.3f' % (num, t.elapsed))
+
+
+def benchmark_results_store(num_nets=1000, num_test=1000, num_output=45):
+    """Prints the time to load results of many nets from results.pkl and a store."""
+    rng = np.random.RandomState(0)
+    bounds = rng.rand(num_test) < 0.3
+    results = [{'lang': ['english', 'danish'][i % 2],
+                'name': 'net%d' % i,
+                'seed': i,
+                'distributed': False,
+                'test_errors': rng.rand() * 1e4,
+                'test_outputs': rng.rand(num_test, num_output).astype(np.float32),
+                'exp_a_errors': list(rng.rand(72)),
+                'exp_b_errors': list(rng.rand(72)),
+                'test_bounds': bounds}
+               for i in range(num_nets)]
+    directory = tempfile.mkdtemp()
+    pickle_file = os.path.join(directory, 'results.pkl')
+    store_dir = os.path.join(directory, 'results')
+    with utils.Timer(print_func=None) as t:
+        joblib.dump(results, pickle_file, compress=3)
+    print('%32s %10.3f seconds' % ('write results.pkl', t.elapsed))
+    with utils.Timer(print_func=None) as t:
+        store.write(results, store_dir)
+    print('%32s %10.3f seconds' % ('write store', t.elapsed))
+    parts_dir = os.path.join(directory, 'parts')
+    with utils.Timer(print_func=None) as t:
+        for result in results:
+            store.append(result, parts_dir)
+    print('%32s %10.3f seconds' % ('append a part per net', t.elapsed))
+    del results
+
+    loads = [('load results.pkl', lambda: joblib.load(pickle_file)),
+             ('load scalar columns', lambda: store.read_table(store_dir)),
+             ('load exp_a_errors', lambda: store.read_column(store_dir, 'exp_a_errors')),
+             ('load all columns', lambda: store.read_results(store_dir)),
+             ('load scalar columns of parts', lambda: store.read_table(parts_dir)),
+             ('compact parts', lambda: store.compact(parts_dir)),
+             ('load compacted scalar columns', lambda: store.read_table(parts_dir))]
+    for name, load in loads:
+        with utils.Timer(print_func=None) as t:
+            load()
+        print('%32s %10.3f seconds' % (name, t.elapsed))
+
+
+def write_text_per_element(path, inputs, targets):
+    """The original Network._write_ex_file, for comparison."""
+    with open(path, 'w+') as f:
+        for input, target, in zip(inputs, targets):
+            f.write('name: {A -> B}\n')
+            f.write('1\n')
+            f.write('I: %s T: %s;\n' % (' '.join(map(str, input)),
+                                        ' '.join(map(str, target))))
+
+
+def benchmark_example_files(**kwargs):
+    """Prints write time and size of each example file format."""
+    inputs, targets = get_examples(**kwargs)
+    writers = [('per element text', write_text_per_element, '.ex'),
+               ('text', examples.write_text, '.ex'),
+               ('gzip text', examples.write_text, '.ex.gz'),
+               ('binary', examples.write_binary, '.bex')]
+    directory = tempfile.mkdtemp()
+    print('%18s %10s %10s' % ('format', 'seconds', 'MB'))
+    for name, write, extension in writers:
+        path = os.path.join(directory, 'examples' + extension)
+        with utils.Timer(print_func=None) as t:
+            write(path, inputs, targets)
+        print('%18s %10.3f %10.2f' % (name, t.elapsed, os.path.getsize(path) / 1e6))
+
+
+if __name__ == '__main__':
+    benchmark_streams()
+    benchmark_example_files()
+    benchmark_sparse()
+    benchmark_outputs()
+    compare_precision()
+    benchmark_segmentation()
+    benchmark_threshold_sweep()
+    benchmark_results_store()
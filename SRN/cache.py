@@ -0,0 +1,145 @@
+"""Content addressed on-disk cache of numpy arrays.
+
+Each entry is a directory of .npy files named by a hash of the files and
+parameters that produced the arrays, so editing a corpus or encoding file
+invalidates the entries that depend on it. Arrays are loaded as read-only
+memory maps, so parallel workers share one copy through the page cache.
+When the cache grows past max_bytes, the least recently used entries are
+removed.
+
+Several processes may share a cache. Entries are renamed into and out of
+place, so an entry is either complete or absent, and an entry that
+disappears while it is being read counts as a miss.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+
+CACHE_DIR = 'cache'
+MAX_BYTES = 2 * 1024 ** 3
+FORMAT_VERSION = 1  # increment when the layout of entries changes
+
+
+@lru_cache(None)
+def _file_digest(path, mtime, size):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_digest(path):
+    """Returns the sha1 of a file's contents, cached until the file changes."""
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime, stat.st_size)
+
+
+def make_key(files, params):
+    """Returns a key for arrays computed from files with params (a dict).
+
+    Include a version of the code that computes the arrays in params, so
+    that changing it invalidates old entries."""
+    sha = hashlib.sha1()
+    sha.update(b'%d' % FORMAT_VERSION)
+    for path in files:
+        sha.update(file_digest(path).encode())
+    sha.update(repr(sorted(params.items())).encode())
+    return sha.hexdigest()
+
+
+def load(key, cache_dir=CACHE_DIR):
+    """Returns a dict of memory mapped arrays, or None if key isn't cached."""
+    entry = os.path.join(cache_dir, key)
+    try:
+        inode = os.stat(entry).st_ino
+        files = os.listdir(entry)
+        # An entry that is removed while it is listed can look empty or
+        # partial, but it has been renamed away by then.
+        if os.stat(entry).st_ino != inode:
+            return None
+        os.utime(entry)  # mark as recently used
+        return {file[:-4]: np.load(os.path.join(entry, file), mmap_mode='r')
+                for file in files}
+    except FileNotFoundError:  # not cached, or evicted by another process
+        return None
+
+
+def store(key, arrays, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Saves a dict of arrays under key, then evicts old entries."""
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary directory and rename it, so that other processes
+    # never see a partially written entry.
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp-')
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, name + '.npy'), array)
+    try:
+        os.rename(tmp, os.path.join(cache_dir, key))
+    except OSError:
+        shutil.rmtree(tmp)  # another process stored the same entry first
+    evict(max_bytes, cache_dir)
+
+
+def entry_size(entry):
+    return sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+
+
+def remove(entry):
+    """Removes an entry, first renaming it so that no one loads it half removed.
+
+    Returns False if the entry doesn't exist (any more)."""
+    old = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix='.old-')
+    try:
+        os.rename(entry, os.path.join(old, 'entry'))
+        return True
+    except FileNotFoundError:
+        return False
+    finally:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def evict(max_bytes=MAX_BYTES, cache_dir=CACHE_DIR):
+    """Removes least recently used entries until the cache fits in max_bytes.
+
+    Entries that other processes remove in the meantime are skipped."""
+    entries = []
+    for key in os.listdir(cache_dir):
+        if key.startswith('.'):
+            continue
+        entry = os.path.join(cache_dir, key)
+        try:
+            entries.append((os.path.getmtime(entry), entry_size(entry), entry))
+        except FileNotFoundError:
+            continue
+    entries.sort(reverse=True)
+    total = 0
+    for _, size, entry in entries:
+        total += size
+        if total > max_bytes:
+            remove(entry)
+
+
+def cached(compute, files, params, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Returns compute(), a dict of arrays, loading it from the cache if possible.
+
+    A missing entry, or one that is evicted while it is loaded, is a miss,
+    and the arrays are computed again.
+
+    Args:
+      compute: function of no arguments returning a dict of arrays.
+      files: paths of the files the arrays are computed from.
+      params: dict of the other values the arrays depend on, including a
+        version of compute.
+    """
+    key = make_key(files, params)
+    arrays = load(key, cache_dir)
+    if arrays is None:
+        computed = compute()
+        store(key, computed, cache_dir, max_bytes)
+        # The new entry is evicted immediately if it is larger than max_bytes.
+        arrays = load(key, cache_dir) or computed
+    return arrays
@@ -4,9 +4,20 @@ import csv
 import random
 from functools import lru_cache
 
+import numpy as np
+
+ENCODING_FILE = 'encodings/distributed.csv'
+CHUNK_SIZE = 100000  # phonemes per chunk in the streaming pipeline
+# Phonemes sharing these features form one class of a hierarchical softmax.
+CLASS_FEATURES = ('voc', 'son', 'stop', 'voi', 'boundary')
+
+def corpus_file(lang):
+    return 'corpora/%s-corpus.txt' % lang
+
+
 def get_corpus(lang, word_boundaries=True):
     """Returns corpus as continuous string of phonemes and utterance boundaries"""
-    with open('corpora/%s-corpus.txt' % lang, 'r') as corpus:
+    with open(corpus_file(lang), 'r') as corpus:
         corpus = (line[1:-1] for line in corpus)  # remove leading Q and trailing \n
         corpus = ''.join(corpus)
     if not word_boundaries:
@@ -21,7 +32,7 @@ def get_corpus(lang, word_boundaries=True):
 
 
 @lru_cache(None)
-def get_encoding(file='encodings/distributed.csv', distributed=True):
+def get_encoding(file=ENCODING_FILE, distributed=True):
     """Returns phoneme-unit mappings for the given language."""
     with open(file,'r') as f:
         reader = csv.reader(f)
@@ -32,6 +43,68 @@ def get_encoding(file='encodings/distributed.csv', distributed=True):
             alphabet = [row[0] for row in reader]
             return localist_encoding(alphabet)
 
+@lru_cache(None)
+def get_alphabet(file=ENCODING_FILE):
+    """Returns (str,): the phonemes in file, in the order of their indices."""
+    with open(file, 'r') as f:
+        reader = csv.reader(f)
+        next(reader)  # skip header
+        return tuple(row[0] for row in reader)
+
+
+@lru_cache(None)
+def get_encoding_matrix(file=ENCODING_FILE, distributed=True):
+    """Returns a float32 array whose i-th row encodes the i-th phoneme.
+
+    The rows match get_encoding, so encoding a corpus of phoneme indices
+    is a single fancy indexing operation: matrix[indices]."""
+    if not distributed:
+        matrix = np.eye(len(get_alphabet(file)), dtype=np.float32)
+    else:
+        with open(file, 'r') as f:
+            reader = csv.reader(f)
+            next(reader)  # skip header
+            matrix = np.array([row[1:] for row in reader], dtype=np.float32)
+    matrix.flags.writeable = False  # shared by every caller
+    return matrix
+
+
+def get_phoneme_classes(features=CLASS_FEATURES, file=ENCODING_FILE):
+    """Returns an int array with the class of each phoneme in the alphabet.
+
+    Phonemes are in the same class if they agree on all of features,
+    which are column names in file."""
+    with open(file, 'r') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        columns = [header.index(feature) for feature in features]
+        keys = [tuple(row[c] for c in columns) for row in reader]
+    class_ids = {}
+    return np.array([class_ids.setdefault(key, len(class_ids)) for key in keys])
+
+
+@lru_cache(None)
+def _translate_table(file):
+    table = bytearray([255] * 256)
+    for idx, phone in enumerate(get_alphabet(file)):
+        table[ord(phone)] = idx
+    return bytes(table)
+
+
+def to_indices(corpus, file=ENCODING_FILE):
+    """Returns a uint8 array with the alphabet index of each phoneme in corpus.
+
+    Raises ValueError if the corpus contains symbols missing from file."""
+    if not isinstance(corpus, str):
+        corpus = ''.join(corpus)
+    indices = np.frombuffer(corpus.encode('ascii').translate(_translate_table(file)),
+                            dtype=np.uint8)
+    if (indices == 255).any():
+        unknown = sorted(set(np.array(list(corpus))[indices == 255]))
+        raise ValueError('symbols not in %s: %s' % (file, ''.join(unknown)))
+    return indices
+
+
 def localist_encoding(alphabet):
     """Returns an encoding with each phoneme mapped to a single unit."""
     encoding = {}
@@ -51,7 +124,8 @@ def train_test_split(corpus, num_train, num_test, mode='end'):
     if mode == 'random':
         indices = random.sample(range(len(corpus)), num_test)
         train = corpus
-        test = [train.pop(i) for i in sorted(indices)]
+        # Pop from the end so earlier pops don't shift later indices.
+        test = [train.pop(i) for i in sorted(indices, reverse=True)][::-1]
 
     elif mode == 'begin':
         test, train = corpus[:num_test], corpus[num_test:]
@@ -62,6 +136,90 @@ def train_test_split(corpus, num_train, num_test, mode='end'):
     return train, test
 
 
+def boundary_chunks(corpus, chunk_size=CHUNK_SIZE, file=ENCODING_FILE):
+    """Yields (phones, boundaries) arrays for successive pieces of corpus.
+
+    The array equivalent of main.extract_boundaries: phones holds the alphabet
+    indices of every phoneme except word boundaries (X), and boundaries is
+    True where the next symbol is a word or utterance boundary. Each chunk
+    covers chunk_size symbols of corpus, so holds at most chunk_size phones.
+    """
+    boundary_codes = np.frombuffer(b'XQ', dtype=np.uint8)
+    for start in range(0, len(corpus) - 1, chunk_size):
+        # One extra symbol so the last phone of the piece knows what follows.
+        piece = np.frombuffer(corpus[start:start + chunk_size + 1].encode('ascii'),
+                              dtype=np.uint8)
+        current, nxt = piece[:-1], piece[1:]
+        keep = current != ord('X')
+        phones = to_indices(current[keep].tobytes().decode('ascii'), file)
+        yield phones, np.isin(nxt[keep], boundary_codes)
+
+
+def rechunk(chunks, chunk_size=CHUNK_SIZE):
+    """Yields tuples of arrays regrouped into exactly chunk_size rows.
+
+    Only the last tuple may be shorter."""
+    buffered, num_buffered = [], 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        num_buffered += len(chunk[0])
+        while num_buffered >= chunk_size:
+            joined = [np.concatenate(arrays) for arrays in zip(*buffered)]
+            yield tuple(array[:chunk_size] for array in joined)
+            rest = tuple(array[chunk_size:] for array in joined)
+            buffered, num_buffered = [rest], len(rest[0])
+    if num_buffered:
+        yield tuple(np.concatenate(arrays) for arrays in zip(*buffered))
+
+
+def stream_split(chunks, num_train, num_test, mode='end', chunk_size=CHUNK_SIZE):
+    """Divides a stream of array chunks without holding it in memory.
+
+    Like train_test_split, but chunks is a callable returning a fresh
+    iterator of tuples of arrays (e.g. from boundary_chunks), and only the
+    first num_train + num_test rows are used.
+
+    Returns (train, test): train is a generator of tuples with chunk_size
+    rows (the last may be shorter), and test is a tuple of arrays.
+    Raises ValueError if the stream has fewer than num_train + num_test rows.
+    """
+    total = num_train + num_test
+    # Stop counting once there are enough rows; only a short corpus is read
+    # to the end.
+    length = 0
+    for chunk in chunks():
+        length += len(chunk[0])
+        if length >= total:
+            break
+    if length < total:
+        raise ValueError('len(corpus) == {}. Too short!'.format(length))
+
+    # is_test[i] is True if row i belongs to the test set.
+    if mode == 'random':
+        test_rows = np.array(sorted(random.sample(range(total), num_test)), dtype=int)
+    elif mode == 'begin':
+        test_rows = np.arange(num_test)
+    elif mode == 'end':
+        test_rows = np.arange(num_train, total)
+    else:
+        raise ValueError('unknown mode: %s' % mode)
+
+    def select(want_test):
+        start = 0
+        for chunk in chunks():
+            if start >= total:
+                break
+            stop = min(start + len(chunk[0]), total)
+            rows = np.arange(start, stop)
+            is_test = np.isin(rows, test_rows, assume_unique=True)
+            mask = is_test if want_test else ~is_test
+            yield tuple(array[:stop - start][mask] for array in chunk)
+            start = stop
+
+    test = tuple(np.concatenate(arrays) for arrays in zip(*select(True)))
+    return rechunk(select(False), chunk_size), test
+
+
 def summarize_corpus(lang):
     word_corpus = get_corpus(lang, word_boundaries=True)
     num_phonemes = len(get_corpus(lang).replace('Q', ''))
@@ -0,0 +1,107 @@
+"""Reading and writing example files.
+
+Two formats are supported:
+
+  text: the Lens .ex format written by Network._write_ex_file, one dense
+    (I:/T:) example per event. write_text formats a whole chunk of examples
+    with a single string operation instead of calling str() on every value.
+    Lens reads gzip compressed example files, so a path ending in .gz is
+    compressed on the fly.
+
+  binary: a small header followed by the float32 inputs and targets. Files
+    can be memory mapped by read_binary without parsing anything. Neither
+    backend reads it: it is a standalone interchange format for keeping
+    examples on disk outside of Lens (compared in benchmark.py).
+"""
+import gzip
+import re
+
+import numpy as np
+
+from srn import as_examples, as_matrix
+
+BINARY_MAGIC = b'SRNEX001'
+HEADER = np.dtype([('magic', 'S8'), ('num_examples', '<u8'),
+                   ('num_input', '<u4'), ('num_output', '<u4')])
+CHUNK_SIZE = 10000  # examples formatted per string operation
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=1)
+    return open(path, mode)
+
+
+def _event_field(code, rows):
+    """Returns the format of one .ex field and rows as a 2d array."""
+    if rows.ndim == 1:
+        # Lower case codes list the indices of the active units.
+        return code.lower() + ': %d', rows[:, None]
+    # %.9g round trips float32, and writes 0 and 1 as single characters.
+    return '%s: %s' % (code, ' '.join(['%.9g'] * rows.shape[1])), rows
+
+
+def write_text(path, inputs, targets):
+    """Writes examples in the Lens .ex format used by Network.
+
+    Sparse (unit index) inputs and targets are written in the i: and t:
+    forms, dense ones in the I: and T: forms."""
+    input_format, inputs = _event_field('I', as_examples(inputs))
+    target_format, targets = _event_field('T', as_examples(targets))
+    event = 'name: {A -> B}\n1\n%s %s;\n' % (input_format, target_format)
+    with _open(path, 'wt') as f:
+        for start in range(0, len(inputs), CHUNK_SIZE):
+            chunk = np.hstack([inputs[start:start + CHUNK_SIZE],
+                               targets[start:start + CHUNK_SIZE]])
+            f.write((event * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def read_text(path):
+    """Returns (inputs, targets) from a .ex file written by write_text.
+
+    Sparse fields are returned as 1d integer arrays of unit indices."""
+    inputs, targets = [], []
+    input_dtype = target_dtype = float
+    with _open(path, 'rt') as f:
+        for line in f:
+            if line[:3] in ('I: ', 'i: '):
+                input_dtype = float if line[0] == 'I' else int
+                target_dtype = float if ' T: ' in line else int
+                input, target = re.split(' [Tt]: ', line[3:].rstrip(';\n'))
+                inputs.append(input.split(' '))
+                targets.append(target.split(' '))
+
+    def to_array(rows, dtype):
+        array = np.array(rows, dtype=dtype)
+        return array[:, 0] if dtype is int else array
+    return to_array(inputs, input_dtype), to_array(targets, target_dtype)
+
+
+def write_binary(path, inputs, targets):
+    """Writes examples in the binary format."""
+    inputs, targets = as_matrix(inputs), as_matrix(targets)
+    header = np.array([(BINARY_MAGIC, len(inputs), inputs.shape[1], targets.shape[1])],
+                      dtype=HEADER)
+    with open(path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(inputs.astype('<f4').tobytes())
+        f.write(targets.astype('<f4').tobytes())
+
+
+def read_binary(path, mmap=True):
+    """Returns (inputs, targets) float32 arrays from a binary example file.
+
+    With mmap=True the arrays are read-only views of the file on disk."""
+    header = np.fromfile(path, dtype=HEADER, count=1)[0]
+    if header['magic'] != BINARY_MAGIC:
+        raise ValueError('%s is not a binary example file' % path)
+    num_examples = int(header['num_examples'])
+    num_input, num_output = int(header['num_input']), int(header['num_output'])
+    if mmap:
+        data = np.memmap(path, dtype='<f4', mode='r', offset=HEADER.itemsize)
+    else:
+        data = np.fromfile(path, dtype='<f4', offset=HEADER.itemsize)
+    split = num_examples * num_input
+    inputs = data[:split].reshape(num_examples, num_input)
+    targets = data[split:split + num_examples * num_output].reshape(num_examples, num_output)
+    return inputs, targets
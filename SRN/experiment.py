@@ -6,6 +6,8 @@ import logging
 
 import numpy as np
 
+ANSWER_KEY = 'experiment/answer-key.txt'
+
 
 def softmax(x):
     """Compute softmax values for each sets of scores in x."""
@@ -50,11 +52,122 @@ def get_network_choices(trial_errors):
     return choices, reaction_times
 
 
-def get_correct_choices():
+def simulate_choices(trial_errors, k=7, num_subjects=1, seed=None, relative=True,
+                     key=None):
+    """Returns (choices, reaction_times, accuracy) of simulated subjects.
+
+    Each simulated subject chooses word 1 of a trial with probability
+    logistic(k * d), where d is the error of word 0 minus the error of word
+    1, relative to their mean (as in Analysis/analysis.py) or, with
+    relative=False, not (as in get_network_choices, with k=0.1). All nets,
+    subjects and trials are drawn at once.
+
+    Args:
+      trial_errors: (nets, trials, 2) array of the errors for the two words
+        of each trial. A (trials, 2) array is treated as one net.
+      k (float): steepness of the choice function.
+      num_subjects (int): number of simulated subjects per net.
+      seed: seed or np.random.Generator for the choices.
+      key: index of the correct word in each trial, by default
+        get_correct_choices().
+
+    Returns:
+      choices: (nets, subjects, trials) array of 0 or 1.
+      reaction_times: (nets, trials) array, the inverse of the relative
+        difference between the errors, which doesn't vary across subjects.
+      accuracy: (nets, subjects) fraction of correct choices.
+    """
+    trial_errors, difference, key = _choice_inputs(trial_errors, relative, key)
+    with np.errstate(over='ignore'):
+        p_second = logistic(difference, k)
+
+    rng = np.random.default_rng(seed)
+    draws = rng.random((len(trial_errors), num_subjects, len(key)))
+    choices = (draws < p_second[:, None]).astype(np.int8)
+    with np.errstate(divide='ignore'):
+        reaction_times = (trial_errors.mean(-1)
+                          / np.abs(trial_errors[..., 0] - trial_errors[..., 1]))
+    accuracy = (choices == key).mean(-1)
+    return choices, reaction_times, accuracy
+
+
+def _choice_inputs(trial_errors, relative, key):
+    """Returns (trial_errors, difference, key) as arrays for the choice rule.
+
+    difference is what the logistic choice function of word 1 is applied to."""
+    trial_errors = np.asarray(trial_errors, dtype=float)
+    if trial_errors.ndim == 2:
+        trial_errors = trial_errors[None]
+    if key is None:
+        key = get_correct_choices()
+    key = np.asarray(key)
+    if trial_errors.shape[1] != len(key):
+        raise ValueError('%s trials but %s answers' % (trial_errors.shape[1], len(key)))
+
+    difference = trial_errors[..., 0] - trial_errors[..., 1]
+    if relative:
+        difference = difference / trial_errors.mean(-1)
+    return trial_errors, difference, key
+
+
+def expected_accuracy(trial_errors, k=7, relative=True, key=None):
+    """Returns the exact mean and variance of the accuracy of simulate_choices.
+
+    Each trial is correct with probability q = logistic(k * d), where d is
+    the choice difference (see simulate_choices), negated for trials whose
+    correct word is word 0. The accuracy of a subject is the mean of
+    independent Bernoulli(q) trials, so
+
+        E = mean(q)          dE/dk = mean(q (1 - q) d)
+        Var = sum(q (1 - q)) / trials**2
+        dVar/dk = sum((1 - 2q) q (1 - q) d) / trials**2
+
+    Args are as for simulate_choices.
+
+    Returns:
+      (mean, variance, d_mean_dk, d_variance_dk): arrays with a value per net.
+    """
+    _, difference, key = _choice_inputs(trial_errors, relative, key)
+    difference = np.where(key == 1, difference, -difference)
+    with np.errstate(over='ignore'):
+        q = logistic(difference, k)
+    slope = q * (1 - q)
+    num_trials = len(key)
+    return (q.mean(-1),
+            slope.sum(-1) / num_trials ** 2,
+            (slope * difference).mean(-1),
+            ((1 - 2 * q) * slope * difference).sum(-1) / num_trials ** 2)
+
+
+def fit_steepness(trial_errors, accuracy, k=7, relative=True, key=None):
+    """Returns the k whose expected accuracies best fit observed accuracies.
+
+    Minimizes the squared difference between expected_accuracy and the
+    accuracy of each net (e.g. of the human subjects it models), using the
+    exact gradient.
+
+    Args:
+      trial_errors: as for simulate_choices.
+      accuracy: observed accuracy for each net.
+      k (float): initial steepness.
+    """
+    from scipy import optimize
+    accuracy = np.asarray(accuracy, dtype=float)
+
+    def loss(params):
+        mean, _, d_mean, _ = expected_accuracy(trial_errors, params[0], relative, key)
+        residual = mean - accuracy
+        return np.sum(residual ** 2), np.array([2 * np.sum(residual * d_mean)])
+
+    return optimize.minimize(loss, [k], jac=True, method='L-BFGS-B').x[0]
+
+
+def get_correct_choices(file=ANSWER_KEY):
     """Returns [int]: index of correct word for each trial"""
-    with open('experiment/answer-key.txt', 'r') as f:
+    with open(file, 'r') as f:
         key = f.read()
-    return [int(k) for k in key.split('\n')]
+    # The key has one answer per line, with \r line endings.
+    return [int(k) for k in key.split()]
 
 
 def test_word_choices(choices):
@@ -1,10 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
+import cache
 import corpora
 import utils
 from sklearn import metrics
-from network import Network
-from joblib import Parallel, delayed
-import joblib
+
+CORPORA_VERSION = 1  # increment when encode_corpora's output changes
 
 
 def extract_boundaries(corpus):
@@ -17,78 +19,217 @@ def extract_boundaries(corpus):
                              if phone != 'X')         # except ones that lead with a boundary
     return phones_and_boundaries
 
-def prepare(corpus, distributed):
-    # Nets are trained to predict the next phoneme.
-    inputs, targets = zip(*utils.neighbors(corpus))
+def prepare(corpus, distributed, sparse=False):
+    """Returns (inputs, targets): encoded phonemes and the phonemes following them.
 
-    # Encode phonemes into numeric representations.
-    encoding = corpora.get_encoding(distributed=distributed)
+    Encodings are rows of a float32 array. With sparse=True localist
+    encodings are returned as phoneme indices instead of one-hot rows.
+    """
+    # Nets are trained to predict the next phoneme.
+    indices = corpora.to_indices(corpus)
+    return encode_pairs(indices[:-1], indices[1:], distributed, sparse)
 
-    return [encoding[c] for c in inputs], [encoding[c] for c in targets]
 
+def encode_pairs(inputs, targets, distributed, sparse=False):
+    """Encodes arrays of input and target phoneme indices, as prepare does."""
+    if sparse and not distributed:
+        return inputs, targets
 
-def get_corpora(lang, num_train=500000, num_test=10000, distributed=False):
+    # Encode phonemes into numeric representations.
+    encoding = corpora.get_encoding_matrix(distributed=distributed)
+    return encoding[inputs], encoding[targets]
+
+
+def use_sparse_inputs(net):
+    """Sets up net for localist examples given as phoneme indices, if it takes them.
+
+    Nets created with sparse=True (and distributed=False) get indices
+    instead of one-hot rows, so their layer sizes are set here from the
+    alphabet. Returns True for such nets, for the sparse argument of prepare.
+    """
+    if not getattr(net, 'sparse', False) or net.distributed:
+        return False
+    if net.num_input is None:
+        net.num_input = net.num_output = len(corpora.get_alphabet())
+    return True
+
+
+def get_corpora(lang, num_train=500000, num_test=10000, distributed=False, use_cache=True,
+                sparse=False):
+    """Returns (train_in, train_out), (test_in, test_out), test_bounds as arrays.
+
+    Results are kept in an on-disk cache (see cache.py), keyed by the corpus
+    and encoding files, the arguments and CORPORA_VERSION.
+    """
+    def compute():
+        return encode_corpora(lang, num_train, num_test, distributed, sparse)
+
+    if use_cache:
+        files = [corpora.corpus_file(lang), corpora.ENCODING_FILE]
+        params = {'lang': lang, 'num_train': num_train, 'num_test': num_test,
+                  'distributed': distributed, 'sparse': sparse, 'mode': 'end',
+                  'version': CORPORA_VERSION}
+        arrays = cache.cached(compute, files, params)
+    else:
+        arrays = compute()
+    return ((arrays['train_in'], arrays['train_out']),
+            (arrays['test_in'], arrays['test_out']),
+            arrays['test_bounds'])
+
+
+def stream_corpora(lang, num_train=500000, num_test=10000, distributed=False,
+                   chunk_size=corpora.CHUNK_SIZE, sparse=False):
+    """Like get_corpora, but the training set is a generator of chunks.
+
+    Each chunk is an (inputs, targets) pair with chunk_size examples, so the
+    training set is never held in memory at once. Targets are the next
+    phoneme, also across chunk boundaries.
+    """
+    with utils.timed('corpus load'):
+        full_corpus = corpora.get_corpus(lang, word_boundaries=True)
+        train, test = corpora.stream_split(lambda: corpora.boundary_chunks(full_corpus),
+                                           num_train, num_test, 'end', chunk_size)
+    test_phones, test_bounds = test
+
+    def train_chunks():
+        previous = np.empty(0, dtype=np.uint8)
+        for phones, _ in train:
+            phones = np.concatenate([previous, phones])
+            with utils.timed('encoding'):
+                chunk = encode_pairs(phones[:-1], phones[1:], distributed, sparse)
+            yield chunk
+            previous = phones[-1:]
+
+    with utils.timed('encoding'):
+        test = encode_pairs(test_phones[:-1], test_phones[1:], distributed, sparse)
+    # Remove the trailing bound to match test_out.
+    return train_chunks(), test, test_bounds[:-1]
+
+
+def encode_corpora(lang, num_train, num_test, distributed, sparse=False):
+    """Returns a dict of arrays for get_corpora."""
+    with utils.timed('corpus load'):
         full_corpus = corpora.get_corpus(lang, word_boundaries=True)
 
         # A list of (phoneme, precedes_boundary) tuples.
         phones_and_boundaries = extract_boundaries(full_corpus)
 
         # Divide into train and test.
-        train, test = corpora.train_test_split(phones_and_boundaries, 
+        train, test = corpora.train_test_split(phones_and_boundaries,
                                                num_train, num_test, mode='end')
 
         # Separate phones from boundary markers.
         train_phones, _ = map(list, zip(*train))
         test_phones, test_bounds = map(list, zip(*test))
-        joblib.dump(test_bounds, lang + '_bounds.pkl')
-        return
 
-        # Construct targets and encode phonemes.
-        train_in, train_out = prepare(train_phones, distributed)
-        test_in, test_out = prepare(test_phones, distributed)
-        
-        # Remove the trailing bound to match test_out.
-        del test_bounds[-1]
-        assert len(train_in) == len(train_out)
-        assert len(test_in) == len(test_out) == len(test_bounds)
+    # Construct targets and encode phonemes.
+    with utils.timed('encoding'):
+        train_in, train_out = prepare(train_phones, distributed, sparse)
+        test_in, test_out = prepare(test_phones, distributed, sparse)
+
+    # Remove the trailing bound to match test_out.
+    del test_bounds[-1]
+    assert len(train_in) == len(train_out)
+    assert len(test_in) == len(test_out) == len(test_bounds)
+
+    return {'train_in': train_in,
+            'train_out': train_out,
+            'test_in': test_in,
+            'test_out': test_out,
+            'test_bounds': np.array(test_bounds, dtype=bool)}
 
-        return (train_in, train_out), (test_in, test_out), test_bounds
 
+def run_experiment(net, lang, exp, online=False, sink=None):
+    """Trains net on an experiment's familiarization corpus and tests each trial.
 
-def run_experiment(net, lang, exp):
+    With online=True the net also trains on each trial as it is scored
+    (see Network.fit_trials), and sink receives each trial's error.
+
+    Returns [float]: error_total for each trial word."""
     with open('experiment/{0}/train{1}.txt'.format(lang, exp), 'r') as f:
         exp_train = f.read()
-    train = prepare(exp_train, net.distributed)
+    sparse = use_sparse_inputs(net)
+    train = prepare(exp_train, net.distributed, sparse)
     net.fit(*train)
 
     with open('experiment/{0}/test{1}.txt'.format(lang, exp), 'r') as f:
         trials = ['Q' + word.strip() + 'Q' for word in f]
 
-    for word in trials:
-        trial_in, trial_out = prepare(word, net.distributed)
-        result = net.test(trial_in, trial_out)
-        yield result
-
-
-def run_net(net, lang, num_train, num_test, name=None):
+    sequences = [prepare(word, net.distributed, sparse) for word in trials]
+    if online:
+        return list(net.fit_trials(sequences, sink))
+    return list(net.test_many(sequences))
+
+
+def run_net(net, lang, num_train, num_test, name=None, stream=False, parallel=False):
+    """Trains net on a corpus, then evaluates it (see evaluate_net)."""
+    # One Lens process trains, tests and runs experiment A (see open_session).
+    with net.open_session():
+        if stream:
+            # Train on one chunk at a time to bound memory use.
+            train_chunks, test, test_bounds = stream_corpora(lang, num_train, num_test,
+                                                             net.distributed,
+                                                             sparse=use_sparse_inputs(net))
+            for train in train_chunks:
+                net.fit(*train)
+        else:
+            train, test, test_bounds = get_corpora(lang, num_train, num_test, net.distributed,
+                                                   sparse=use_sparse_inputs(net))
+            net.fit(*train)
+        return evaluate_net(net, lang, test, test_bounds, name, parallel)
+
+
+def run_population(population, lang, num_train, num_test):
+    """Like run_net, but all nets in a NetworkPopulation are trained together."""
+    train, test, test_bounds = get_corpora(lang, num_train, num_test,
+                                           population.distributed,
+                                           sparse=use_sparse_inputs(population))
+    population.fit(*train)
+    # Members may share a seed, so each is named by its index too.
+    return [evaluate_net(net, lang, test, test_bounds,
+                         '%s_m%s_s%s_h%s_r%s_%s' % (lang, i, net.seed, net.num_hidden,
+                                                   net.learning_rate,
+                                                   'd' if net.distributed else 'l'))
+            for i, net in enumerate(population.networks())]
+
+
+def evaluate_net(net, lang, test, test_bounds, name=None, parallel=False):
+    """Tests a trained net on the test corpus and both experiments.
+
+    With parallel=True and the lens backend, experiment B runs in a second
+    Lens process while the first tests the net and runs experiment A. Sweeps
+    already run one net per worker, so leave it off there.
+    """
     name = name or lang + str(net.seed) + ('d' if net.distributed else 'l')
     save_dir = 'nets/' + name
-    train, test, test_bounds = get_corpora(lang, num_train, num_test, net.distributed)
-    net.fit(*train)
     print('saved', name)
     net.save(save_dir)
-    test_result = net.test(*test)
+    # Both experiments start from the trained net, which testing doesn't change.
+    exp_b_net = net.fork()
+    # Each net launches Lens and loads its weights once for all its runs.
+    def test_and_run_a():
+        with net.open_session():
+            return net.test(*test), run_experiment(net, lang, 'A')
+
+    def run_b():
+        with exp_b_net.open_session():
+            return run_experiment(exp_b_net, lang, 'B')
+
+    if parallel and net.backend == 'lens':
+        # The threads only wait on the Lens processes.
+        with ThreadPoolExecutor(2) as executor:
+            test_and_a, exp_b = executor.submit(test_and_run_a), executor.submit(run_b)
+            test_result, exp_a_errors = test_and_a.result()
+            exp_b_errors = exp_b.result()
+    else:
+        test_result, exp_a_errors = test_and_run_a()
+        exp_b_errors = run_b()
     test_errors = test_result['error_total']
     test_outputs = test_result['out_activations']
 
-    exp_a_results = run_experiment(net, lang, 'A')
-    exp_a_errors = [result['error_total'] for result in exp_a_results]
-    net = Network.load(save_dir)  # reset to before experiment A training
-    exp_b_results = run_experiment(net, lang, 'B')
-    exp_b_errors = [result['error_total'] for result in exp_b_results]
-
     return {'lang': lang,
             'name': name,
+            'seed': net.seed,
             'distributed': net.distributed,
             'test_errors': test_errors,
             'test_outputs': test_outputs,
@@ -97,21 +238,10 @@ def run_net(net, lang, num_train, num_test, name=None):
             'test_bounds': test_bounds}
 
 
-def main(num_nets=1, num_train=50000, num_test=1000):
-    results = []
-    for lang in ['english', 'danish']:
-        nets = [Network(i, distributed=d) for i in range(num_nets) for d in (False, )]
-        jobs = (delayed(run_net)(net, lang, num_train, num_test) for net in nets)
-        results.extend(Parallel(n_jobs=-1)(jobs))
-    
-    joblib.dump(results, 'results.pkl', compress=3)
-
-
 
 
     
 
 
 if __name__ == '__main__':
-    #main()
     get_corpora('english', 600000, 10000)
\ No newline at end of file
@@ -1,4 +1,6 @@
 """Python interface to LENS"""
+import contextlib
+import copy
 import tempfile
 import numpy as np
 import re
@@ -8,10 +10,14 @@ import subprocess
 import pickle
 import os
 
+import corpora
+import examples
 import utils
+from srn import SRN, SRNPopulation, is_sparse
 
 LENS_LOCATION = '/Applications/LensOSX.app/Contents/MacOS/LensOSX'
 LENS_NAME = 'LensOSX'
+LAUNCH_MARKER = '#launched#'  # echoed by .in files once the network is built
 
 if not os.path.isfile(LENS_LOCATION):
     LENS_LOCATION = '/Users/fred/Applications/LensOSX.app/Contents/MacOS/LensOSX'
@@ -19,6 +25,63 @@ if not os.path.isfile(LENS_LOCATION):
 logging.basicConfig(level=logging.INFO)
 
 
+def parse_test_out(out):
+    """Yields the error statistics printed by each Lens test command."""
+    labels = {
+        'Error total:       ',
+        'Error per example: ',
+        'Error per tick:    ',
+        'Unit cost per tick:'
+    }
+    for line in out.split('\n'):
+        if line[:19] in labels:
+            value = re.split(': +', line)[-1]
+            yield float(value)
+
+
+def parse_train_out(out):
+    """Yields the error of each update reported by a Lens train command.
+
+    With reportInterval 1 Lens prints a line for every update, such as
+    ' 701241)   3.90779   0.00000   107959   -0.02885        0s        0s',
+    whose error was computed before the weights were updated."""
+    for match in re.finditer(r'^ *\d+\) +(\S+)', out, re.MULTILINE):
+        yield float(match.group(1))
+
+
+
+def set_layer_sizes(net, inputs, targets):
+    """Sets net.num_input and net.num_output from the first examples.
+
+    Sparse examples (1d arrays of unit indices) don't determine the layer
+    size, so it must have been set already. Raises ValueError if the
+    examples don't match sizes that are already set."""
+    for layer, rows in (('input', inputs), ('output', targets)):
+        attr = 'num_' + layer
+        size = getattr(net, attr)
+        if is_sparse(rows):
+            if size is None:
+                raise ValueError('%s must be set to use sparse %ss' % (attr, layer))
+        elif size is None:
+            setattr(net, attr, len(rows[0]))
+        elif size != len(rows[0]):
+            raise ValueError('incompatible %s size: %s !=  %s'
+                             % (layer, len(rows[0]), size))
+
+
+
+def read_text_activations(path, num_output):
+    """Returns the activations printed by a Lens test script as an array.
+
+    The first line of the file is blank, and each following line holds the
+    output activations for one example."""
+    with open(path, 'r') as f:
+        next(f)  # skip first line
+        values = np.fromstring(f.read(), sep=' ')
+    return values.reshape(-1, num_output)
+
+
+
 class Network(object):
     """A simple recurrent network to be used in experimental modeling
 
@@ -32,12 +95,23 @@ class Network(object):
         incoding (dict): maps phonemes to input layer network representations.
         outcoding (dict): maps phonemes to outupt layer network representations.
         time (str): last time the network was modified.
+        backend (str): 'lens' runs LensOSX, 'numpy' uses the in-process SRN.
+        output (str): output layer of the numpy backend: 'logistic' (as in
+          Lens), 'softmax' or 'hierarchical' (a softmax factored into
+          output_classes, by default corpora.get_phoneme_classes()).
+        num_streams (int): number of parallel training streams (numpy backend).
+        dtype (str): 'float64' or 'float32' precision of the numpy backend.
+        weights_dtype (str): if set, e.g. 'float16', save() stores the numpy
+          backend's weights at this precision.
+        num_input, num_output (int): layer sizes. Set by the first call to
+          fit(), except for sparse examples, which need them set beforehand.
 
 
         """
     def __init__(self, seed=0, num_hidden=80, learning_rate=0.1, momentum=0.95,
                  backprop_ticks=1, rand_range=0.25, architecture='templates/architecture.txt',
-                 **kwargs):
+                 backend='lens', num_streams=1, output='logistic', output_classes=None,
+                 dtype='float64', weights_dtype=None, **kwargs):
         super(Network, self).__init__()
         self.seed = seed
         self.num_hidden = num_hidden
@@ -45,29 +119,151 @@ class Network(object):
         self.momentum = momentum
         self.backprop_ticks = backprop_ticks
         self.rand_range = rand_range
+        if backend not in ('lens', 'numpy'):
+            raise ValueError('unknown backend: %s' % backend)
+        self.backend = backend
+        if num_streams > 1 and backend != 'numpy':
+            raise ValueError('num_streams > 1 requires the numpy backend')
+        self.num_streams = num_streams
+        if output != 'logistic' and backend != 'numpy':
+            raise ValueError('%s output requires the numpy backend' % output)
+        if output != 'logistic' and kwargs.get('distributed'):
+            raise ValueError('%s output requires localist targets' % output)
+        self.output = output
+        self.output_classes = output_classes
+        if (dtype != 'float64' or weights_dtype is not None) and backend != 'numpy':
+            raise ValueError('dtype and weights_dtype require the numpy backend')
+        self.dtype = dtype
+        self.weights_dtype = weights_dtype
 
         self.num_input = None  # set by first call to fit()
         self.num_output = None
+        self._srn = None  # numpy backend engine, created by first call to fit()
+        self._session = None  # LensSession, see open_session()
 
-        os.makedirs('temp-lens', exist_ok=True)
-        self.dir = os.path.abspath(tempfile.mkdtemp(dir='temp-lens')) + '/'
-        logging.info('directory: ' + self.dir)
-        self.weight_file = os.path.abspath(self.dir + 'weights.wt')
+        if backend == 'lens':
+            os.makedirs('temp-lens', exist_ok=True)
+            self.dir = os.path.abspath(tempfile.mkdtemp(dir='temp-lens')) + '/'
+            logging.info('directory: ' + self.dir)
+            self.weight_file = os.path.abspath(self.dir + 'weights.wt')
 
         self.__dict__.update(kwargs)
 
+    def __getstate__(self):
+        # A running Lens process can't be pickled.
+        state = self.__dict__.copy()
+        state['_session'] = None
+        return state
+
+    def open_session(self):
+        """Starts a Lens process that fit() and test() reuse until close_session().
+
+        The network is built once and the weights are loaded once, instead of
+        once per call. Can be used as a context manager:
+
+            with net.open_session():
+                for word in trials:
+                    net.test(*prepare(word, net.distributed))
+
+        which closes the session on exit only if this call started it, so a
+        session that is already open stays open.
+
+        Does nothing for the numpy backend, which already runs in process.
+        """
+        if self.backend != 'lens' or self._session is not None:
+            return contextlib.nullcontext(self)
+        load_weights = os.path.isfile(self.weight_file)
+        self._session = LensSession(self._format_template('architecture.in'),
+                                    self.weight_file, load_weights)
+        return self
+
+    def close_session(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ty, val, tb):
+        self.close_session()
+
+    def snapshot(self):
+        """Returns an in-memory copy of the trained state, for restore().
+
+        Returns None if the network hasn't been fit yet."""
+        if self.backend == 'numpy':
+            return self._srn and self._srn.snapshot()
+        if not os.path.isfile(self.weight_file):
+            return None
+        with open(self.weight_file, 'rb') as f:
+            return f.read()
+
+    def restore(self, snapshot):
+        """Returns the network to the state returned by snapshot().
+
+        restore(None) returns it to the state before the first fit()."""
+        if self.backend == 'numpy':
+            if snapshot is None:
+                self._srn = None
+            elif self._srn is None:
+                raise RuntimeError('the network must be fit before it is restored')
+            else:
+                self._srn.restore(snapshot)
+            return
+        if snapshot is None:
+            # A running session can't unload its weights, so it is restarted.
+            reopen = self._session is not None
+            self.close_session()
+            if os.path.isfile(self.weight_file):
+                os.remove(self.weight_file)
+            if reopen:
+                self.open_session()
+            return
+        with open(self.weight_file, 'wb') as f:
+            f.write(snapshot)
+        if self._session is not None:
+            self._session.load_weights()
+
+    def fork(self):
+        """Returns an independent copy of the network with the same weights."""
+        session, self._session = self._session, None
+        try:
+            net = copy.deepcopy(self)
+        finally:
+            self._session = session
+        if self.backend == 'lens':
+            net.dir = os.path.abspath(tempfile.mkdtemp(dir='temp-lens')) + '/'
+            net.weight_file = os.path.abspath(net.dir + 'weights.wt')
+            if os.path.isfile(self.weight_file):
+                shutil.copy(self.weight_file, net.weight_file)
+        return net
+
     def save(self, dir):
-        """Saves the network for later use."""
+        """Saves the network for later use.
+
+        Weights of the numpy backend are saved to weights.npz rather than
+        pickled with the network, at the precision of weights_dtype."""
         os.makedirs(dir, exist_ok=True)
-        with open(dir + '/network.pkl', 'wb+') as f:
-            pickle.dump(self, f)
-        shutil.copy(self.weight_file, dir)
+        srn, self._srn = self._srn, None
+        try:
+            with open(dir + '/network.pkl', 'wb+') as f:
+                pickle.dump(self, f)
+        finally:
+            self._srn = srn
+        if srn is not None:
+            srn.save(dir + '/weights.npz', self.weights_dtype)
+        if self.backend == 'lens':
+            shutil.copy(self.weight_file, dir)
 
     @staticmethod
     def load(dir):
         with open(dir + '/network.pkl', 'rb') as f:
             net = pickle.load(f)
-        shutil.copy(dir + '/weights.wt', net.weight_file)
+        if os.path.isfile(dir + '/weights.npz'):
+            net._srn = SRN.load(dir + '/weights.npz')
+        if net.backend == 'lens':
+            shutil.copy(dir + '/weights.wt', net.weight_file)
         return net
 
     def fit(self, inputs, targets):
@@ -78,54 +274,75 @@ class Network(object):
         if len(inputs) != len(targets):
             raise ValueError('inputs and targets have different lengths: %s and %s'
                              % (len(inputs), len(targets)))
-        if self.num_input is None:
-            self.num_input = len(inputs[0])
-            self.num_output = len(targets[0])
-        elif self.num_input != len(inputs[0]):
-            raise ValueError('incompatible input size: %s !=  %s'
-                             % (len(inputs[0]), self.num_input))
-        elif self.num_output != len(targets[0]):
-            raise ValueError('incompatible output size: %s !=  %s'
-                             % (len(targets[0]), self.num_output))
+        set_layer_sizes(self, inputs, targets)
+
+        if self.backend == 'numpy':
+            if self._srn is None:
+                classes = self.output_classes
+                if self.output == 'hierarchical' and classes is None:
+                    classes = corpora.get_phoneme_classes()
+                if classes is not None and len(classes) != self.num_output:
+                    raise ValueError('%s output classes for %s output units'
+                                     % (len(classes), self.num_output))
+                self._srn = SRN(self.num_input, self.num_hidden, self.num_output,
+                                self.learning_rate, self.momentum,
+                                self.backprop_ticks, self.rand_range, self.seed,
+                                self.output, classes, self.dtype)
+            with utils.Timer(print_func=None, stage='train') as t:
+                self._srn.train(inputs, targets, self.num_streams)
+            logging.info('trained on %s items in %s seconds' % (len(inputs), t.elapsed))
+            return
 
         self._write_ex_file('train.ex', inputs, targets)
-        self._write_in_file('train.in')
         with utils.Timer(print_func=None) as t:
-            self._run_lens('train.in')
+            if self._session is not None:
+                with utils.timed('train'):
+                    self._session.train(self.dir + 'train.ex', len(inputs))
+            else:
+                self._write_in_file('train.in')
+                self._run_lens('train.in', 'train')
         logging.info('trained on %s items in %s seconds' % (len(inputs), t.elapsed))
 
 
-    def test(self, inputs, targets):
+    def test(self, inputs, targets, activations_file=None):
+        """Tests the network without changing its weights.
+
+        Returns a dict with the Lens error statistics and out_activations,
+        a (examples, output units) array. If activations_file is given, the
+        activations are written to it as a float32 .npy file and returned as
+        a read-only memory map, so large test sets are never held in memory.
+        """
         if len(inputs) != len(targets):
             raise ValueError('inputs and targets have different lengths: %s and %s'
                              % (len(inputs), len(targets)))
 
+        if self.backend == 'numpy':
+            if self._srn is None:
+                raise RuntimeError('the network must be fit before it is tested')
+            with utils.timed('test'):
+                return self._srn.test(inputs, targets, activations_file)
+
         self._write_ex_file('test.ex', inputs, targets)
-        self._write_in_file('test.in')
-        out = self._run_lens('test.in')
-
-        # Recover saved unit activations.
-        out_activations = []
-        with open(self.dir + '/output-activations.out', 'r') as acts_file:
-            next(acts_file) # skip first line
-            for line in acts_file:
-                activations = line.split(' ')[:-1]
-                activations = [float(a) for a in activations]
-                out_activations.append(activations)
-        out_activations = np.array(out_activations)
-
-        def parse_test_out(out):
-            # Get the useful information out of the lens stdout.
-            labels = {
-                'Error total:       ',
-                'Error per example: ',
-                'Error per tick:    ',
-                'Unit cost per tick:'
-            }
-            for line in out.split('\n'):
-                if line[:19] in labels:
-                    value = re.split(': +', line)[-1]
-                    yield float(value)
+        if self._session is not None:
+            path = activations_file or self.dir + 'output-activations.npy'
+            # Lens writes float32 values directly after the .npy header.
+            acts = np.lib.format.open_memmap(path, mode='w+', dtype='<f4',
+                                             shape=(len(inputs), self.num_output))
+            offset = acts.offset
+            del acts
+            with utils.timed('test'):
+                out = self._session.test(self.dir + 'test.ex', path, offset)
+            with utils.timed('activation parse'):
+                out_activations = np.load(path, mmap_mode='r' if activations_file else None)
+        else:
+            self._write_in_file('test.in')
+            out = self._run_lens('test.in', 'test')
+            with utils.timed('activation parse'):
+                out_activations = read_text_activations(self.dir + 'output-activations.out',
+                                                        self.num_output)
+                if activations_file is not None:
+                    np.save(activations_file, out_activations.astype('<f4'))
+                    out_activations = np.load(activations_file, mmap_mode='r')
 
         field_names = ['error_total', 'error_per_example', 'error_per_tick',
                        'unit_cost_per_tick', 'out_activations']
@@ -136,28 +353,112 @@ class Network(object):
             raise
 
         return dict(zip(field_names, values))
-        
+
+    def test_many(self, sequences):
+        """Tests on each of several (inputs, targets) sequences separately.
+
+        The context starts from its initial state for every sequence, as it
+        does for a separate call to test(), but all sequences are scored in
+        one engine invocation: as parallel streams by the numpy backend, and
+        in one command block of a LensSession by the lens backend.
+
+        Returns an array with the error_total of each sequence.
+        """
+        for inputs, targets in sequences:
+            if len(inputs) != len(targets):
+                raise ValueError('inputs and targets have different lengths: %s and %s'
+                                 % (len(inputs), len(targets)))
+
+        if self.backend == 'numpy':
+            if self._srn is None:
+                raise RuntimeError('the network must be fit before it is tested')
+            with utils.timed('test'):
+                return self._srn.test_many(sequences)
+
+        ex_files = []
+        for i, (inputs, targets) in enumerate(sequences):
+            self._write_ex_file('test%s.ex' % i, inputs, targets)
+            ex_files.append(self.dir + 'test%s.ex' % i)
+        with self.open_session(), utils.timed('test'):
+            out = self._session.test_many(ex_files)
+        try:
+            # Each test prints four statistics, starting with the total error.
+            errors = np.array(list(parse_test_out(out))[::4])
+        except Exception:
+            logging.error('Lens output:\n' + out)
+            raise
+        if len(errors) != len(sequences):
+            raise RuntimeError('expected %s test results from Lens, got %s:\n%s'
+                               % (len(sequences), len(errors), out))
+        return errors
+
+
+    def fit_trials(self, sequences, sink=None):
+        """Trains on each (inputs, targets) sequence, recording its error.
+
+        Like the original Lens experiment script, the network keeps learning
+        while it is scored. Each sequence starts from the initial context;
+        its error is measured and its weight updates applied in the same
+        pass, with each example scored before its own update. The lens
+        backend reads these errors from the training report of Lens.
+
+        Args:
+          sequences: list of (inputs, targets) pairs.
+          sink: optional function called as sink(index, error) as soon as
+            the error of each sequence is known.
+
+        Returns an array with the error_total of each sequence.
+        """
+        for inputs, targets in sequences:
+            if len(inputs) != len(targets):
+                raise ValueError('inputs and targets have different lengths: %s and %s'
+                                 % (len(inputs), len(targets)))
+
+        if self.backend == 'numpy':
+            if self._srn is None:
+                raise RuntimeError('the network must be fit before it is tested')
+            errors = []
+            with utils.timed('train'):
+                for i, (inputs, targets) in enumerate(sequences):
+                    self._srn.reset()
+                    errors.append(self._srn.train(inputs, targets))
+                    if sink is not None:
+                        sink(i, errors[-1])
+            return np.array(errors)
+
+        errors = []
+        with self.open_session():
+            for i, (inputs, targets) in enumerate(sequences):
+                self._write_ex_file('trial%s.ex' % i, inputs, targets)
+                with utils.timed('train'):
+                    out = self._session.train_trial(self.dir + 'trial%s.ex' % i,
+                                                    len(inputs))
+                update_errors = list(parse_train_out(out))
+                if len(update_errors) != len(inputs):
+                    raise RuntimeError('expected %s updates from Lens, got %s:\n%s'
+                                       % (len(inputs), len(update_errors), out))
+                errors.append(sum(update_errors))
+                if sink is not None:
+                    sink(i, errors[-1])
+            self._session.save_weights()
+        return np.array(errors)
 
     def _write_ex_file(self, file, inputs, targets):
-        with open(self.dir + file, 'w+') as f:      
-            for input, target, in zip(inputs, targets):
-                """Writes one example to a .ex file"""
-                #f.write('name: {%s -> %s}\n' % (input, target))
-                f.write('name: {A -> B}\n')
-                f.write('1\n')
-                # Ppper case letter indicates dense encoding.
-                f.write('I: %s T: %s;\n' % (' '.join(map(str, input)), 
-                                            ' '.join(map(str, target))))
-                #if distributed:
-                #else:
-                    #f.write('i: ' + self.incoding[input] + ' t: ' + self.outcoding[target] + ';\n')
+        with utils.timed('example file write'):
+            examples.write_text(self.dir + file, inputs, targets)
+
+    def _format_template(self, *files):
+        """Returns the joined template files with variables from self."""
+        templates = []
+        for file in files:
+            with open('templates/' + file) as f:
+                templates.append(f.read())
+        return '\n'.join(templates) % self.__dict__
 
     def _write_in_file(self, file):
-        with open('templates/architecture.in') as f:
-            architecture = f.read()
-        with open('templates/' + file) as f:
-            full = '\n'.join([architecture, f.read()])
-            formatted = full % self.__dict__  # replaces variables in template file
+        formatted = '\n'.join([self._format_template('architecture.in'),
+                               'echo %s' % LAUNCH_MARKER,
+                               self._format_template(file)])
         with open(self.dir + file, 'w+') as f:
             f.write(formatted)
 
@@ -171,13 +472,29 @@ class Network(object):
                     % (self.lang, distributed, self.seed, self.hidden, rate,
                        momentum, self.ticks, rand_range, self.num_train,))
 
-    def _run_lens(self, in_file):
+    def _run_lens(self, in_file, stage):
         """Executes a lens .in file and returens output.
 
+        Starting Lens and building the network is timed as the engine launch
+        stage, and the rest of the script as stage (see utils.timed).
+
         Raises RuntimeError if there is an error in the lens script."""
         in_file = self.dir + in_file
         # todo: pipe output to terminal and python
-        out = subprocess.check_output([LENS_LOCATION, '-b', in_file]).decode('utf-8')
+        lines = []
+        with utils.timed('engine launch'):
+            process = subprocess.Popen([LENS_LOCATION, '-b', in_file], stdout=subprocess.PIPE,
+                                       encoding='utf-8')
+            for line in process.stdout:
+                if line.rstrip('\n') == LAUNCH_MARKER:
+                    break
+                lines.append(line)
+        with utils.timed(stage):
+            lines.extend(process.stdout)
+            process.wait()
+        out = ''.join(lines)
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, process.args, out)
         if out[-8:] != 'success\n':  # script echos 'success' at the end
             raise RuntimeError('Error whil executing %s:\n%s' % (in_file, out))
         #out = out[:out.rindex('\n')]  # remove success message
@@ -187,12 +504,182 @@ class Network(object):
         return out
 
 
+class LensSession(object):
+    """A long-lived Lens process driven through stdin and stdout.
+
+    The network is built from the rendered architecture template once, and
+    every command block ends by echoing a marker so that its output can be
+    read back without waiting for the process to exit.
+    """
+    MARKER = '#done#'
+
+    def __init__(self, architecture, weight_file, load_weights=True):
+        super(LensSession, self).__init__()
+        self.weight_file = weight_file
+        with utils.timed('engine launch'):
+            self.process = subprocess.Popen([LENS_LOCATION, '-b'], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, universal_newlines=True)
+            commands = [architecture]
+            if load_weights:
+                commands.append('loadWeights %s' % weight_file)
+            self._run('\n'.join(commands))
+
+    def _run(self, commands):
+        """Sends a block of commands and returns their output."""
+        self.process.stdin.write('%s\necho %s\n' % (commands, self.MARKER))
+        self.process.stdin.flush()
+        lines = []
+        for line in self.process.stdout:
+            if line.rstrip('\n') == self.MARKER:
+                return ''.join(lines)
+            lines.append(line)
+        raise RuntimeError('Lens exited unexpectedly:\n' + ''.join(lines))
+
+    def train(self, ex_file, num_updates):
+        """Trains on every example in ex_file once and saves the weights."""
+        return self._run('\n'.join([
+            'loadExamples %s -s train' % ex_file,
+            'useTrainingSet train',
+            'setObj num_updates %s' % num_updates,
+            'train',
+            'saveWeights %s -v 2' % self.weight_file,
+        ]))
+
+    def test(self, ex_file, activations_file, offset=0):
+        """Tests on ex_file, writing output activations to activations_file.
+
+        Activations are written as little endian float32 values, one row per
+        example, starting offset bytes into the existing file."""
+        return self._run('\n'.join([
+            'loadExamples %s -s test' % ex_file,
+            'useTestingSet test',
+            'set acts [open %s r+]' % activations_file,
+            'fconfigure $acts -translation binary',
+            'seek $acts %d' % offset,
+            'proc writeOutputs {} {',
+            '    global acts',
+            '    set n [getObj output.numUnits]',
+            '    for {set u 0} {$u < $n} {incr u} {',
+            '        puts -nonewline $acts [binary format r [getObj output.unit($u).output]]',
+            '    }',
+            '}',
+            'setObj postEventProc writeOutputs',
+            'test',
+            'setObj postEventProc {}',
+            'close $acts',
+        ]))
+
+    def test_many(self, ex_files):
+        """Tests on each file in ex_files in turn, without saving activations."""
+        commands = []
+        for ex_file in ex_files:
+            commands.extend(['loadExamples %s -s test' % ex_file,
+                             'useTestingSet test',
+                             'test'])
+        return self._run('\n'.join(commands))
+
+    def train_trial(self, ex_file, num_examples):
+        """Trains on each example in ex_file, reporting the error of every update.
+
+        The weights are not saved; see save_weights()."""
+        return self._run('\n'.join([
+            'loadExamples %s -s trial' % ex_file,
+            'useTrainingSet trial',
+            'set interval [getObj reportInterval]',
+            'setObj reportInterval 1',
+            'setObj num_updates %s' % num_examples,
+            'train',
+            'setObj reportInterval $interval',
+        ]))
+
+    def save_weights(self):
+        return self._run('saveWeights %s -v 2' % self.weight_file)
+
+    def load_weights(self):
+        """Reloads the weights from the weight file."""
+        return self._run('loadWeights %s' % self.weight_file)
+
+    def close(self):
+        self.process.stdin.write('exit\n')
+        self.process.stdin.close()
+        self.process.wait()
+
+
+
+
+class NetworkPopulation(object):
+    """Networks that differ only in seed (and optionally hyperparameters).
+
+    All members are trained together by the numpy backend on one copy of the
+    examples. learning_rate, momentum and rand_range may be scalars or have
+    one value per seed. Use networks() to get the members as Networks.
+    Members have logistic output units.
+    """
+    def __init__(self, seeds, num_hidden=80, learning_rate=0.1, momentum=0.95,
+                 backprop_ticks=1, rand_range=0.25, num_streams=1, dtype='float64',
+                 **kwargs):
+        super(NetworkPopulation, self).__init__()
+        if kwargs.get('output', 'logistic') != 'logistic':
+            raise ValueError('populations only support logistic output')
+        self.seeds = list(seeds)
+        self.num_hidden = num_hidden
+        self.learning_rate = learning_rate
+        self.momentum = momentum
+        self.backprop_ticks = backprop_ticks
+        self.rand_range = rand_range
+        self.num_streams = num_streams
+        self.dtype = dtype
 
+        self.num_input = None  # set by first call to fit()
+        self.num_output = None
+        self._population = None
+        self._kwargs = kwargs
+        self.__dict__.update(kwargs)
 
-def example():
+    def fit(self, inputs, targets):
+        if len(inputs) != len(targets):
+            raise ValueError('inputs and targets have different lengths: %s and %s'
+                             % (len(inputs), len(targets)))
+        if self._population is None:
+            set_layer_sizes(self, inputs, targets)
+            self._population = SRNPopulation(
+                self.seeds, self.num_input, self.num_hidden, self.num_output,
+                self.learning_rate, self.momentum, self.backprop_ticks, self.rand_range,
+                self.dtype)
+        with utils.Timer(print_func=None, stage='train') as t:
+            self._population.train(inputs, targets, self.num_streams)
+        logging.info('trained %s nets on %s items in %s seconds'
+                     % (len(self.seeds), len(inputs), t.elapsed))
+
+    def test(self, inputs, targets):
+        """Returns a list with the Network.test results of each member."""
+        if self._population is None:
+            raise RuntimeError('the population must be fit before it is tested')
+        with utils.timed('test'):
+            return self._population.test(inputs, targets)
+
+    def networks(self):
+        """Returns [Network]: an independent copy of each member."""
+        if self._population is None:
+            raise RuntimeError('the population must be fit before its networks are used')
+        nets = []
+        for i, seed in enumerate(self.seeds):
+            srn = self._population.member(i)
+            net = Network(seed, self.num_hidden, srn.learning_rate, srn.momentum,
+                          self.backprop_ticks, srn.rand_range, backend='numpy',
+                          num_streams=self.num_streams, dtype=self.dtype, **self._kwargs)
+            net.num_input, net.num_output = self.num_input, self.num_output
+            net._srn = srn
+            nets.append(net)
+        return nets
+
+
+
+
+def example(backend='lens'):
     train_in, train_targets = np.random.rand(1000, 20), np.random.rand(1000, 10)
     test_in, test_targets = np.random.rand(100, 20), np.random.rand(100, 10)
-    net = Network(num_hidden=40, momentum=0.9)
+    net = Network(num_hidden=40, momentum=0.9, backend=backend)
     net.fit(train_in, train_targets)
     error = net.test(test_in, test_targets)['error_total']
     print(error)
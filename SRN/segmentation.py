@@ -1,11 +1,60 @@
 """Compares a list of word boundary predictions to true word boundaries"""
 from __future__ import division, print_function
-from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import tempfile
+
 import joblib
 import numpy as np
+from sklearn import metrics
 
 import utils
 
+
+class DebugSink(object):
+    """Writes debugging artifacts to files from a background thread.
+
+    Every dump() goes to a new file with a unique name, so sinks in parallel
+    workers never overwrite each other's files. Scoring functions only write
+    artifacts when they are given a sink:
+
+        with DebugSink('debug') as sink:
+            test_word_segmentation(correct, predicted, sink, 'english0l')
+    """
+    def __init__(self, directory='debug'):
+        super(DebugSink, self).__init__()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._pool = ThreadPoolExecutor(1)
+
+    def dump(self, obj, name):
+        """Schedules obj to be written to a file whose name starts with name.
+
+        Returns a Future of the path of the file."""
+        return self._pool.submit(self._write, obj, name)
+
+    def _write(self, obj, name):
+        try:
+            fd, path = tempfile.mkstemp(prefix=name + '-', suffix='.pkl', dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                joblib.dump(obj, f)
+        except Exception:
+            logging.exception('failed to write debug artifact ' + name)
+            raise
+        return path
+
+    def close(self):
+        """Waits until every scheduled artifact is written."""
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, ty, val, tb):
+        self.close()
+
+
 def extract_boundaries(corpus):
     assert 0
     corpus = iter(corpus)
@@ -46,40 +95,187 @@ def get_predicted_word_boundaries(break_out):
     return predicted_boundaries
 
 
+def _scores(hits, alarms, misses):
+    """Returns (precision, recall, F), all 0 if there are no hits."""
+    hits, alarms, misses = int(hits), int(alarms), int(misses)
+    if hits == 0:
+        # avoid zero division
+        return 0, 0, 0
+    precision = hits / (hits + alarms)
+    recall = hits / (hits + misses)
+    return precision, recall, 2 * (precision * recall) / (precision + recall)
+
+
+def boundary_counts(correct_boundaries, predicted_boundaries):
+    """Returns a (nets, 4) array of hits, alarms, misses and rejects.
+
+    Args:
+      correct_boundaries: (examples,) true word boundaries.
+      predicted_boundaries: (nets, examples) predicted boundaries of each net.
+    """
+    correct = np.asarray(correct_boundaries, dtype=bool)
+    predicted = np.asarray(predicted_boundaries, dtype=bool)
+    num_nets = len(predicted)
+    # Code each example by its net and result: hit 0, alarm 1, miss 2, reject 3.
+    codes = 2 * ~predicted + ~correct + 4 * np.arange(num_nets)[:, None]
+    return np.bincount(codes.ravel(), minlength=4 * num_nets).reshape(num_nets, 4)
+
+
+def word_counts(correct_boundaries, predicted_boundaries):
+    """Returns arrays of the word hits, alarms and misses of each net.
+
+    A word is the span between two consecutive boundaries. Spans are coded
+    as start * examples + end, so the correct spans are sorted, and each
+    predicted span is looked up in them by binary search.
+
+    Args are as for boundary_counts.
+    """
+    predicted = np.asarray(predicted_boundaries, dtype=bool)
+    num_nets, num_examples = predicted.shape
+    correct = np.flatnonzero(correct_boundaries).astype(np.int64)
+    correct_words = correct[:-1] * num_examples + correct[1:]
+
+    nets, positions = np.nonzero(predicted)
+    positions = positions.astype(np.int64)
+    same_net = nets[:-1] == nets[1:]
+    words = (positions[:-1] * num_examples + positions[1:])[same_net]
+    word_nets = nets[:-1][same_net]
+
+    found = np.searchsorted(correct_words, words)
+    hit = found < len(correct_words)
+    hit[hit] = correct_words[found[hit]] == words[hit]
+    hits = np.bincount(word_nets[hit], minlength=num_nets)
+    num_predicted = np.bincount(word_nets, minlength=num_nets)
+    return hits, num_predicted - hits, len(correct_words) - hits
+
+
 def test_boundary_prediction(correct_boundaries, predicted_boundaries):
     assert len(correct_boundaries) == len(predicted_boundaries)
+    return score_boundaries(correct_boundaries, [predicted_boundaries])[0]
 
-    result_map = {(True, True): 'hit',
-                  (True, False): 'alarm',
-                  (False, True): 'miss',
-                  (False, False): 'reject'}
 
-    results = Counter(result_map[(p, c)] for p, c in
-                      zip(predicted_boundaries, correct_boundaries))
+def score_boundaries(correct_boundaries, predicted_boundaries):
+    """Returns test_boundary_prediction results for each row of predicted_boundaries."""
+    results = []
+    for hits, alarms, misses, _ in boundary_counts(correct_boundaries, predicted_boundaries):
+        precision, recall, F = _scores(hits, alarms, misses)
+        results.append({'boundary_precision': precision,
+                        'boundary_recall': recall,
+                        'boundary_F': F})
+    return results
 
-    if results['hit'] == 0:
-        # avoid zero division
-        precision = 0
-        recall = 0
-        F = 0
-    else:
-        precision = results['hit'] / (results['hit'] + results['alarm'])
-        recall = results['hit'] / (results['hit'] + results['miss'])
-        F = 2 * (precision * recall) / (precision+recall)
 
-    return {'boundary_precision': precision,
-            'boundary_recall': recall,
-            'boundary_F': F}
+def score_words(correct_boundaries, predicted_boundaries):
+    """Returns test_word_segmentation results for each row of predicted_boundaries."""
+    results = []
+    for hits, alarms, misses in zip(*word_counts(correct_boundaries, predicted_boundaries)):
+        precision, recall, F = _scores(hits, alarms, misses)
+        results.append({'word_precision': precision,
+                        'word_recall': recall,
+                        'word_F': F})
+    return results
+
+
+def score_segmentations(correct_boundaries, break_outs):
+    """Returns the boundary and word results of many nets in one call.
+
+    Each net's boundaries are predicted as by get_predicted_word_boundaries.
+
+    Args:
+      correct_boundaries: (examples,) true word boundaries.
+      break_outs: (examples, nets) boundary unit activations, a column per net.
+
+    Returns [dict]: test_boundary_prediction and test_word_segmentation
+      results of each net.
+    """
+    with utils.timed('scoring'):
+        # One contiguous row per net, so the thresholds are summed exactly as
+        # get_predicted_word_boundaries sums a single column.
+        break_outs = np.ascontiguousarray(np.asarray(break_outs).T)
+        thresholds = np.sum(break_outs, axis=1) / break_outs.shape[1]
+        predicted = break_outs > thresholds[:, None]
+        return [dict(boundary, **words) for boundary, words in
+                zip(score_boundaries(correct_boundaries, predicted),
+                    score_words(correct_boundaries, predicted))]
+
+
+def _sweep_scores(hits, num_predicted, num_correct):
+    """Returns arrays of (precision, recall, F), 0 where there are no hits."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(hits > 0, hits / num_predicted, 0.)
+        recall = np.where(hits > 0, hits / num_correct, 0.)
+        F = np.where(hits > 0, 2 * (precision * recall) / (precision + recall), 0.)
+    return precision, recall, F
+
+
+def threshold_sweep(correct_boundaries, break_out):
+    """Returns segmentation results for every boundary threshold at once.
+
+    Boundaries are predicted where break_out is greater than the threshold,
+    as in get_predicted_word_boundaries, and every distinct activation is a
+    candidate threshold. The activations are sorted once, and the results
+    at all thresholds come from cumulative counts over the sorted order:
+
+      boundaries: the hits at a threshold are the correct boundaries whose
+        activation is above it.
+      words: a correct word is a hit when both of its boundaries are above
+        the threshold and no activation inside it is, so it is a hit for the
+        thresholds between the largest inside activation and the smaller
+        boundary activation.
 
+    Returns:
+      dict: 'threshold' (ascending), 'boundary_precision', 'boundary_recall',
+        'boundary_F', 'word_precision', 'word_recall' and 'word_F' arrays
+        with a value per threshold, and 'boundary_auc', the area under the
+        ROC curve of the boundary unit.
+    """
+    correct = np.asarray(correct_boundaries, dtype=bool)
+    break_out = np.asarray(break_out)
+    order = np.argsort(break_out, kind='stable')
+    sorted_out = break_out[order]
+    thresholds = np.unique(sorted_out)
+    above = len(sorted_out) - np.searchsorted(sorted_out, thresholds, 'right')
 
-def segmentation(row):
+    num_correct = correct.sum()
+    correct_below = np.concatenate([[0], np.cumsum(correct[order])])
+    boundary_hits = num_correct - correct_below[len(sorted_out) - above]
+    boundary = _sweep_scores(boundary_hits, above, num_correct)
+
+    # Every threshold, plus one below all of them, is a point on the ROC curve.
+    true_positive = np.concatenate([[num_correct], boundary_hits]) / max(num_correct, 1)
+    false_positive = (np.concatenate([[len(correct) - num_correct], above - boundary_hits])
+                      / max(len(correct) - num_correct, 1))
+    auc = np.trapezoid(true_positive[::-1], false_positive[::-1])
+
+    indices = np.flatnonzero(correct)
+    ends = np.minimum(break_out[indices[:-1]], break_out[indices[1:]])
+    inside = np.where(correct, -np.inf, break_out)
+    largest_inside = (np.maximum.reduceat(inside[:indices[-1]], indices[:-1])
+                      if len(indices) > 1 else np.empty(0))
+    possible = largest_inside < ends
+    hit_from = np.sort(largest_inside[possible])
+    hit_until = np.sort(ends[possible])
+    word_hits = (np.searchsorted(hit_from, thresholds, 'right')
+                 - np.searchsorted(hit_until, thresholds, 'right'))
+    words = _sweep_scores(word_hits, np.maximum(above - 1, 0), len(indices) - 1)
+
+    results = {'threshold': thresholds, 'boundary_auc': auc}
+    for level, scores in (('boundary', boundary), ('word', words)):
+        for name, values in zip(('precision', 'recall', 'F'), scores):
+            results['%s_%s' % (level, name)] = values
+    return results
+
+
+def segmentation(row, sink=None, name='words'):
     correct_boundaries = row.test_bounds
     break_out = row.test_outputs[:, -1]
-    boundary_auc = metrics.roc_auc_score(row.test_bounds, break_out)
+    with utils.timed('scoring'):
+        boundary_auc = metrics.roc_auc_score(row.test_bounds, break_out)
 
-    predicted_boundaries = get_predicted_word_boundaries(break_out)
-    boundary_results = test_boundary_prediction(correct_boundaries, predicted_boundaries)
-    word_results = test_word_segmentation(correct_boundaries, predicted_boundaries)
+        predicted_boundaries = get_predicted_word_boundaries(break_out)
+        boundary_results = test_boundary_prediction(correct_boundaries, predicted_boundaries)
+        word_results = test_word_segmentation(correct_boundaries, predicted_boundaries, sink,
+                                              name)
 
     return {'boundasy_auc': boundary_auc,
             **boundary_results,
@@ -87,30 +283,21 @@ def segmentation(row):
 
 
 
-def test_word_segmentation(correct_boundaries, predicted_boundaries):
-    # get words as tuples of beginning and end indices
-    correct_indices = np.nonzero(correct_boundaries)[0]
-    predicted_indices = np.nonzero(predicted_boundaries)[0]
-    correct_words = set(map(tuple, utils.neighbors(correct_indices)))
-    predicted_words = set(map(tuple, utils.neighbors(predicted_indices)))
-    joblib.dump((correct_words, predicted_words), 'words.pkl')
-    hits = len(correct_words & predicted_words)
-    alarms = len(predicted_words - correct_words)
-    misses = len(correct_words - predicted_words)
+def word_spans(boundaries):
+    """Returns a (words, 2) array of the beginning and end index of each word."""
+    indices = np.flatnonzero(boundaries)
+    return np.column_stack([indices[:-1], indices[1:]])
 
-    if hits == 0:
-        # avoid zero division
-        precision = 0
-        recall = 0
-        F = 0
-    else:
-        precision = hits / (hits+alarms)
-        recall = hits / (hits+misses)
-        F = 2 * (precision * recall) / (precision+recall)
-
-    return {'word_precision': precision,
-            'word_recall': recall,
-            'word_F': F}
+
+def test_word_segmentation(correct_boundaries, predicted_boundaries, sink=None, name='words'):
+    """Returns word precision, recall and F.
+
+    If a DebugSink is given, the correct and predicted word spans (see
+    word_spans) are dumped to it under name."""
+    assert len(correct_boundaries) == len(predicted_boundaries)
+    if sink is not None:
+        sink.dump((word_spans(correct_boundaries), word_spans(predicted_boundaries)), name)
+    return score_words(correct_boundaries, [predicted_boundaries])[0]
 
 
 def test_segmentation(break_out, boundaries):
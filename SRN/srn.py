@@ -0,0 +1,619 @@
+"""Simple recurrent network implemented in NumPy.
+
+Mirrors the network built by lens.write_lens_files so that Network can be
+trained and tested without LensOSX:
+
+    input  -> hidden  (logistic, not reset between examples)
+    context -> hidden (Elman copy of the previous hidden activations)
+    hidden -> output  (logistic, cross entropy error)
+
+The output layer can instead be a softmax, or a softmax factored into
+phoneme classes (see OUTPUTS). Every example is a single tick, and weights
+are updated after every example (batchSize 1) by steepest descent with
+momentum. Training can also step several streams of examples at once; see
+SRN.train.
+
+Networks compute in float64 by default. With dtype='float32' the weights,
+activations and examples are all float32, which halves the memory traffic
+of every step; benchmark.compare_precision measures the effect on the
+test error and segmentation.
+"""
+from collections import deque
+
+import numpy as np
+
+INIT_OUTPUT = 0.5  # initial activation of Lens ELMAN context groups
+EPSILON = 1e-7  # keeps the cross entropy finite for saturated units
+TEST_CHUNK = 10000  # examples whose hidden activations are held at once
+PARAMS = ['num_input', 'num_hidden', 'num_output', 'learning_rate', 'momentum',
+          'backprop_ticks', 'rand_range', 'output', 'dtype']
+DTYPES = ('float64', 'float32')
+
+
+def logistic(x):
+    limit = 500 if x.dtype == np.float64 else 80  # exp overflows float32 sooner
+    return 1. / (1. + np.exp(-np.clip(x, -limit, limit)))
+
+
+def cross_entropy(out, target):
+    """Returns the Lens cross entropy error summed over units for each row."""
+    out = np.clip(out, EPSILON, 1 - EPSILON)
+    return -np.sum(target * np.log(out) + (1 - target) * np.log(1 - out), axis=-1)
+
+
+def as_matrix(rows, dtype=float):
+    """Returns a float array for a sequence of encoded examples.
+
+    Examples may be arrays, lists of numeric strings (distributed encodings)
+    or bit strings (localist encodings). Arrays that already have the given
+    dtype are returned without a copy."""
+    if isinstance(rows, np.ndarray):
+        return rows.astype(dtype, copy=False)
+    return np.array([[float(v) for v in row] for row in rows], dtype=dtype)
+
+
+def is_sparse(rows):
+    """Returns True if rows are localist unit indices rather than encodings."""
+    return (isinstance(rows, np.ndarray) and rows.ndim == 1
+            and np.issubdtype(rows.dtype, np.integer))
+
+
+def as_examples(rows, dtype=float):
+    """Returns rows as an index array if they are sparse, else as_matrix(rows)."""
+    return rows.astype(np.intp) if is_sparse(rows) else as_matrix(rows, dtype)
+
+
+def dense(rows, num_units, dtype=float):
+    """Returns one-hot rows for sparse rows, or rows unchanged."""
+    if rows.ndim == 1:
+        one_hot = np.zeros((len(rows), num_units), dtype)
+        one_hot[np.arange(len(rows)), rows] = 1
+        return one_hot
+    return rows
+
+
+def log_softmax(x):
+    """Returns log(softmax(x)) along the last axis, without overflow."""
+    x = x - x.max(axis=-1, keepdims=True)
+    return x - np.log(np.exp(x).sum(axis=-1, keepdims=True))
+
+
+def target_indices(targets):
+    """Returns the index of the active unit of each one-hot or sparse target."""
+    return targets if targets.ndim == 1 else targets.argmax(axis=-1)
+
+
+class LogisticOutput(object):
+    """Independent logistic output units with cross entropy error, as in Lens.
+
+    Output layers own the hidden -> output weights. backward() computes the
+    activations, the error and the gradients in one pass, and returns the
+    error gradient with respect to the hidden activations."""
+    def __init__(self, num_output, classes=None):
+        self.num_output = num_output
+
+    def init_weights(self, rand, num_hidden):
+        return {'hidden_output': rand(num_hidden, self.num_output),
+                'output_bias': rand(self.num_output)}
+
+    def check_targets(self, targets):
+        """Raises ValueError if the layer can't be trained on targets."""
+
+    def activate(self, w, hidden):
+        return logistic(hidden @ w['hidden_output'] + w['output_bias'])
+
+    def error(self, out, targets):
+        """Returns the error of each row of activations."""
+        return cross_entropy(out, dense(targets, self.num_output, out.dtype))
+
+    def backward(self, w, hidden, targets, mask):
+        """Returns (error of each row, weight gradients, hidden gradient).
+
+        Rows where mask is 0 contribute nothing."""
+        out = self.activate(w, hidden)
+        targets = dense(targets, self.num_output, out.dtype)
+        d_out = (out - targets) * mask  # logistic units with cross entropy error
+        grads = {'hidden_output': hidden.T @ d_out,
+                 'output_bias': d_out.sum(0)}
+        return (cross_entropy(out, targets) * mask[:, 0], grads,
+                d_out @ w['hidden_output'].T)
+
+
+class SoftmaxOutput(LogisticOutput):
+    """Softmax output units; the error is the cross entropy of the target.
+
+    The activation is fused with the error: both come from one numerically
+    stable log-softmax. Targets must be one-hot or sparse."""
+    def check_targets(self, targets):
+        if targets.ndim == 2 and not (np.isin(targets, (0, 1)).all()
+                                      and (targets.sum(-1) == 1).all()):
+            raise ValueError('%s output requires one-hot or sparse targets'
+                             % type(self).__name__)
+
+    def activate(self, w, hidden):
+        return np.exp(log_softmax(hidden @ w['hidden_output'] + w['output_bias']))
+
+    def error(self, out, targets):
+        rows = np.arange(len(out))
+        return -np.log(np.maximum(out[rows, target_indices(targets)], EPSILON))
+
+    def backward(self, w, hidden, targets, mask):
+        log_out = log_softmax(hidden @ w['hidden_output'] + w['output_bias'])
+        rows, indices = np.arange(len(hidden)), target_indices(targets)
+        d_out = np.exp(log_out)
+        d_out[rows, indices] -= 1
+        d_out *= mask
+        grads = {'hidden_output': hidden.T @ d_out,
+                 'output_bias': d_out.sum(0)}
+        return (-log_out[rows, indices] * mask[:, 0], grads,
+                d_out @ w['hidden_output'].T)
+
+
+class HierarchicalOutput(LogisticOutput):
+    """A softmax factored into classes of output units.
+
+    p(unit) = p(class of unit) * p(unit | class), each a softmax. Training
+    only computes the class softmax and the softmax within the target's
+    class, so its cost grows with the number of classes plus the class
+    size rather than with the number of units. Targets must be one-hot or
+    sparse.
+
+    Args:
+      classes: the class index of each output unit.
+    """
+    def __init__(self, num_output, classes):
+        super(HierarchicalOutput, self).__init__(num_output)
+        self.classes = np.asarray(classes)
+        self.num_classes = self.classes.max() + 1
+        self.members = [np.flatnonzero(self.classes == c) for c in range(self.num_classes)]
+
+    def init_weights(self, rand, num_hidden):
+        weights = super(HierarchicalOutput, self).init_weights(rand, num_hidden)
+        weights['hidden_class'] = rand(num_hidden, self.num_classes)
+        weights['class_bias'] = rand(self.num_classes)
+        return weights
+
+    def activate(self, w, hidden):
+        log_class = log_softmax(hidden @ w['hidden_class'] + w['class_bias'])
+        net = hidden @ w['hidden_output'] + w['output_bias']
+        out = np.empty_like(net)
+        for c, units in enumerate(self.members):
+            out[..., units] = np.exp(log_class[..., c:c+1] + log_softmax(net[..., units]))
+        return out
+
+    check_targets = SoftmaxOutput.check_targets
+    error = SoftmaxOutput.error
+
+    def backward(self, w, hidden, targets, mask):
+        rows, indices = np.arange(len(hidden)), target_indices(targets)
+        classes = self.classes[indices]
+
+        log_class = log_softmax(hidden @ w['hidden_class'] + w['class_bias'])
+        d_class = np.exp(log_class)
+        d_class[rows, classes] -= 1
+        d_class *= mask
+        error = -log_class[rows, classes]
+        d_hidden = d_class @ w['hidden_class'].T
+        grad_output = np.zeros_like(w['hidden_output'])
+        grad_bias = np.zeros_like(w['output_bias'])
+
+        # Only the units in the target classes of the rows are computed.
+        for c in np.unique(classes):
+            units = self.members[c]
+            in_class = classes == c
+            class_hidden = hidden[in_class]
+            class_weights = w['hidden_output'][:, units]
+            log_out = log_softmax(class_hidden @ class_weights + w['output_bias'][units])
+            target_columns = np.searchsorted(units, indices[in_class])
+            class_rows = np.arange(len(class_hidden))
+            error[in_class] -= log_out[class_rows, target_columns]
+            d_out = np.exp(log_out)
+            d_out[class_rows, target_columns] -= 1
+            d_out *= mask[in_class]
+            grad_output[:, units] = class_hidden.T @ d_out
+            grad_bias[units] = d_out.sum(0)
+            d_hidden[in_class] += d_out @ class_weights.T
+
+        grads = {'hidden_class': hidden.T @ d_class,
+                 'class_bias': d_class.sum(0),
+                 'hidden_output': grad_output,
+                 'output_bias': grad_bias}
+        return error * mask[:, 0], grads, d_hidden
+
+
+OUTPUTS = {'logistic': LogisticOutput,
+           'softmax': SoftmaxOutput,
+           'hierarchical': HierarchicalOutput}
+
+
+def split_streams(inputs, targets, num_streams, dtype=float):
+    """Returns (inputs, targets, mask) arranged as (steps, streams, units).
+
+    Stream k holds the k-th contiguous chunk of the examples. Streams that run
+    out of examples are padded, and mask (of the given dtype) is 0 for the
+    padded steps. Sparse examples are arranged as (steps, streams)."""
+    num_steps = -(-len(inputs) // num_streams)  # ceiling division
+    padding = num_steps * num_streams - len(inputs)
+
+    def arrange(array):
+        array = np.concatenate([array, np.zeros((padding,) + array.shape[1:], array.dtype)])
+        return array.reshape((num_streams, num_steps) + array.shape[1:]).swapaxes(0, 1)
+
+    mask = np.ones((len(inputs), 1), dtype)
+    return arrange(inputs), arrange(targets), arrange(mask)
+
+
+class SRN(object):
+    """An Elman network with the architecture of lens.write_lens_files.
+
+    Attributes:
+        weights (dict): maps connection names to weight arrays.
+        deltas (dict): previous weight changes, used for momentum.
+        context (np.ndarray): hidden activations from the previous example.
+        dtype (str): 'float64' or 'float32', the precision of the weights,
+          activations and examples.
+    """
+    def __init__(self, num_input, num_hidden, num_output, learning_rate=0.1,
+                 momentum=0.95, backprop_ticks=1, rand_range=0.25, seed=0,
+                 output='logistic', classes=None, dtype='float64'):
+        super(SRN, self).__init__()
+        self.num_input = num_input
+        self.num_hidden = num_hidden
+        self.num_output = num_output
+        self.learning_rate = learning_rate
+        self.momentum = momentum
+        self.backprop_ticks = backprop_ticks
+        self.rand_range = rand_range
+        if output not in OUTPUTS:
+            raise ValueError('unknown output: %s' % output)
+        if output == 'hierarchical' and classes is None:
+            raise ValueError('hierarchical output requires classes')
+        self.output = output
+        self.classes = classes
+        self.output_layer = OUTPUTS[output](num_output, classes)
+        if dtype not in DTYPES:
+            raise ValueError('unsupported dtype: %s' % dtype)
+        self.dtype = dtype
+
+        # The same seed gives the same initial weights, rounded to dtype.
+        rng = np.random.RandomState(seed)
+        def rand(*shape):
+            return rng.uniform(-rand_range, rand_range, shape).astype(dtype)
+
+        self.weights = {'input_hidden': rand(num_input, num_hidden),
+                        'context_hidden': rand(num_hidden, num_hidden),
+                        'hidden_bias': rand(num_hidden)}
+        self.weights.update(self.output_layer.init_weights(rand, num_hidden))
+        self.deltas = {name: np.zeros_like(w) for name, w in self.weights.items()}
+        self.reset()
+
+    def _project(self, x):
+        """Returns the input to hidden net input for dense or sparse inputs.
+
+        Sparse (index) inputs select rows of the weights instead of
+        multiplying them by a one-hot matrix."""
+        if x.ndim == 1:
+            return self.weights['input_hidden'][x]
+        return x @ self.weights['input_hidden']
+
+    def _input_grad(self, x, d_hidden):
+        if x.ndim == 1:
+            grad = np.zeros_like(self.weights['input_hidden'])
+            np.add.at(grad, x, d_hidden)  # scatter into the selected rows
+            return grad
+        return x.T @ d_hidden
+
+    def _hidden(self, x, context):
+        w = self.weights
+        return logistic(self._project(x) + context @ w['context_hidden'] + w['hidden_bias'])
+
+    def _update(self, grads):
+        for name, grad in grads.items():
+            delta = self.momentum * self.deltas[name] - self.learning_rate * grad
+            self.deltas[name] = delta
+            self.weights[name] += delta
+
+    def snapshot(self):
+        """Returns a copy of the weights, momentum and context."""
+        return {'weights': {name: w.copy() for name, w in self.weights.items()},
+                'deltas': {name: d.copy() for name, d in self.deltas.items()},
+                'context': self.context.copy()}
+
+    def restore(self, snapshot):
+        """Returns the network to the state in a snapshot."""
+        for name in self.weights:
+            self.weights[name][...] = snapshot['weights'][name]
+            self.deltas[name][...] = snapshot['deltas'][name]
+        self.context = snapshot['context'].astype(self.dtype)
+
+    def save(self, file, weights_dtype=None):
+        """Saves the network as an uncompressed .npz file.
+
+        With weights_dtype='float16' the weights, momentum and context are
+        stored at half precision, which halves the file size of a float32
+        network. load() converts them back to the network's dtype."""
+        def stored(array):
+            return array if weights_dtype is None else array.astype(weights_dtype)
+
+        arrays = {'context': stored(self.context)}
+        for name in self.weights:
+            arrays['weights.' + name] = stored(self.weights[name])
+            arrays['deltas.' + name] = stored(self.deltas[name])
+        for param in PARAMS:
+            arrays[param] = getattr(self, param)
+        if self.classes is not None:
+            arrays['classes'] = self.classes
+        np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as arrays:
+            params = {param: arrays[param].item() for param in PARAMS if param in arrays}
+            srn = cls(classes=arrays['classes'] if 'classes' in arrays else None, **params)
+            srn.restore({'weights': {name: arrays['weights.' + name] for name in srn.weights},
+                         'deltas': {name: arrays['deltas.' + name] for name in srn.weights},
+                         'context': arrays['context']})
+        return srn
+
+    def reset(self, num_streams=1):
+        """Sets the context of each stream back to its initial activation."""
+        self.context = np.full((num_streams, self.num_hidden), INIT_OUTPUT, self.dtype)
+
+    def train(self, inputs, targets, num_streams=1):
+        """Trains on the examples in order, updating weights after each step.
+
+        With num_streams > 1 the examples are split into that many contiguous
+        streams, each with its own context. The streams are stepped together,
+        and the weight update at each step sums the gradients of all streams.
+        The context of each stream carries over to the next call as long as
+        num_streams doesn't change.
+
+        Localist inputs and targets may be given as 1d integer arrays of unit
+        indices (see main.prepare), which avoids one-hot matrices.
+
+        Returns the total error over the training examples."""
+        inputs = as_examples(inputs, self.dtype)
+        targets = as_examples(targets, self.dtype)
+        self.output_layer.check_targets(targets)
+        if len(self.context) != num_streams:
+            self.reset(num_streams)
+        inputs, targets, mask = split_streams(inputs, targets, num_streams, self.dtype)
+        w = self.weights
+        # (input, context) pairs for truncated backpropagation through time.
+        history = deque(maxlen=self.backprop_ticks)
+        error = 0.
+        for x, t, m in zip(inputs, targets, mask):
+            hidden = self._hidden(x, self.context)
+            row_errors, grads, d_hidden = self.output_layer.backward(w, hidden, t, m)
+            error += float(row_errors.sum())
+            history.appendleft((x, self.context))
+
+            grads.update({'input_hidden': 0., 'context_hidden': 0., 'hidden_bias': 0.})
+            d_hidden = d_hidden * hidden * (1 - hidden)
+            for x_k, context_k in history:
+                grads['input_hidden'] = grads['input_hidden'] + self._input_grad(x_k, d_hidden)
+                grads['context_hidden'] = grads['context_hidden'] + context_k.T @ d_hidden
+                grads['hidden_bias'] = grads['hidden_bias'] + d_hidden.sum(0)
+                d_hidden = (d_hidden @ w['context_hidden'].T) * context_k * (1 - context_k)
+
+            self._update(grads)
+            # Padded steps at the end of short streams keep their context.
+            self.context = np.where(m > 0, hidden, self.context)
+        return error
+
+    def test(self, inputs, targets, activations_file=None):
+        """Returns a dict with the same fields as Network.test.
+
+        Testing starts from the initial context and leaves the state of the
+        network, including its context, unchanged. If activations_file is given, output activations are streamed to it
+        as a float32 .npy file, and returned as a read-only memory map of it.
+        Only TEST_CHUNK examples are then held in memory at a time."""
+        inputs = as_examples(inputs, self.dtype)
+        targets = as_examples(targets, self.dtype)
+        self.output_layer.check_targets(targets)
+        w = self.weights
+        if activations_file is None:
+            out = np.empty((len(inputs), self.num_output), self.dtype)
+        else:
+            out = np.lib.format.open_memmap(activations_file, mode='w+', dtype='<f4',
+                                            shape=(len(inputs), self.num_output))
+        context = np.full(self.num_hidden, INIT_OUTPUT, self.dtype)
+        error = 0.
+        for start in range(0, len(inputs), TEST_CHUNK):
+            chunk = slice(start, start + TEST_CHUNK)
+            # The input projection doesn't depend on the context, so it is
+            # computed for the whole chunk at once.
+            net_input = self._project(inputs[chunk]) + w['hidden_bias']
+            hidden = np.empty((len(net_input), self.num_hidden), self.dtype)
+            for i in range(len(net_input)):
+                context = logistic(net_input[i] + context @ w['context_hidden'])
+                hidden[i] = context
+            chunk_out = self.output_layer.activate(w, hidden)
+            error += float(self.output_layer.error(chunk_out, targets[chunk]).sum())
+            out[chunk] = chunk_out
+        if activations_file is not None:
+            out.flush()
+            del out
+            out = np.load(activations_file, mmap_mode='r')
+
+        num_examples = max(len(inputs), 1)
+        return {'error_total': error,
+                'error_per_example': error / num_examples,
+                'error_per_tick': error / num_examples,  # one tick per example
+                'unit_cost_per_tick': 0.,
+                'out_activations': out}
+
+    def test_many(self, sequences):
+        """Returns the total error on each (inputs, targets) sequence.
+
+        Every sequence starts from the initial context. The sequences are
+        stepped together as parallel streams, padded to the longest one."""
+        sequences = [(dense(as_examples(inputs, self.dtype), self.num_input, self.dtype),
+                      dense(as_examples(targets, self.dtype), self.num_output, self.dtype))
+                     for inputs, targets in sequences]
+        for _, targets in sequences:
+            self.output_layer.check_targets(targets)
+        w = self.weights
+        num_steps = max([len(inputs) for inputs, _ in sequences] + [0])
+        inputs = np.zeros((num_steps, len(sequences), self.num_input), self.dtype)
+        targets = np.zeros((num_steps, len(sequences), self.num_output), self.dtype)
+        mask = np.zeros((num_steps, len(sequences)), self.dtype)
+        for i, (seq_inputs, seq_targets) in enumerate(sequences):
+            inputs[:len(seq_inputs), i] = seq_inputs
+            targets[:len(seq_targets), i] = seq_targets
+            mask[:len(seq_inputs), i] = 1
+
+        net_input = inputs @ w['input_hidden'] + w['hidden_bias']
+        hidden = np.empty((num_steps, len(sequences), self.num_hidden), self.dtype)
+        context = np.full((len(sequences), self.num_hidden), INIT_OUTPUT, self.dtype)
+        for t in range(num_steps):
+            context = logistic(net_input[t] + context @ w['context_hidden'])
+            hidden[t] = context
+        out = self.output_layer.activate(w, hidden)
+        errors = self.output_layer.error(out.reshape(-1, self.num_output),
+                                         targets.reshape(-1, self.num_output))
+        return (errors.reshape(mask.shape) * mask).sum(0)
+
+
+class SRNPopulation(object):
+    """Several SRNs with the same layer sizes, trained on the same examples.
+
+    The weights of all members are stacked along a leading population axis,
+    so every step of training or testing is a single batched product for the
+    whole population. learning_rate, momentum and rand_range may be given
+    per member, and dtype is as for SRN. Members have logistic output units.
+
+    Attributes:
+        seeds (list): seed of each member.
+        weights (dict): maps connection names to (members, ...) weight arrays.
+        deltas (dict): previous weight changes, used for momentum.
+        context (np.ndarray): (members, streams, hidden) context activations.
+    """
+    def __init__(self, seeds, num_input, num_hidden, num_output, learning_rate=0.1,
+                 momentum=0.95, backprop_ticks=1, rand_range=0.25, dtype='float64'):
+        super(SRNPopulation, self).__init__()
+        self.seeds = list(seeds)
+        self.num_input = num_input
+        self.num_hidden = num_hidden
+        self.num_output = num_output
+        self.backprop_ticks = backprop_ticks
+        self.dtype = dtype
+
+        def per_member(value, dtype=float):
+            return np.broadcast_to(np.asarray(value, dtype=dtype), (len(self.seeds),)).copy()
+        self.learning_rate = per_member(learning_rate, dtype)
+        self.momentum = per_member(momentum, dtype)
+        self.rand_range = per_member(rand_range)
+
+        # Members start with exactly the weights of an SRN with the same seed.
+        members = [SRN(num_input, num_hidden, num_output, rand_range=r, seed=s, dtype=dtype)
+                   for s, r in zip(self.seeds, self.rand_range)]
+        self.weights = {name: np.stack([m.weights[name] for m in members])
+                        for name in members[0].weights}
+        self.deltas = {name: np.zeros_like(w) for name, w in self.weights.items()}
+        self.reset()
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def reset(self, num_streams=1):
+        """Sets the context of each member and stream to its initial activation."""
+        self.context = np.full((len(self), num_streams, self.num_hidden), INIT_OUTPUT,
+                               self.dtype)
+
+    def member(self, i):
+        """Returns an independent SRN with the current state of member i."""
+        srn = SRN(self.num_input, self.num_hidden, self.num_output,
+                  self.learning_rate[i], self.momentum[i], self.backprop_ticks,
+                  self.rand_range[i], self.seeds[i], dtype=self.dtype)
+        srn.weights = {name: w[i].copy() for name, w in self.weights.items()}
+        srn.deltas = {name: d[i].copy() for name, d in self.deltas.items()}
+        srn.context = self.context[i].copy()
+        return srn
+
+    def _project(self, x):
+        """Returns the (members, examples, hidden) net input from the input layer."""
+        if x.ndim == 1:
+            return self.weights['input_hidden'][:, x]
+        return np.einsum('si,nih->nsh', x, self.weights['input_hidden'])
+
+    def _input_grad(self, x, d_hidden):
+        if x.ndim == 1:
+            grad = np.zeros_like(self.weights['input_hidden'])
+            np.add.at(grad, (slice(None), x), d_hidden)
+            return grad
+        return np.einsum('si,nsh->nih', x, d_hidden)
+
+    def _forward(self, x, context):
+        w = self.weights
+        hidden = logistic(self._project(x)
+                          + context @ w['context_hidden'] + w['hidden_bias'][:, None])
+        out = logistic(hidden @ w['hidden_output'] + w['output_bias'][:, None])
+        return hidden, out
+
+    def _update(self, grads):
+        for name, grad in grads.items():
+            shape = (len(self),) + (1,) * (grad.ndim - 1)
+            delta = (self.momentum.reshape(shape) * self.deltas[name]
+                     - self.learning_rate.reshape(shape) * grad)
+            self.deltas[name] = delta
+            self.weights[name] += delta
+
+    def train(self, inputs, targets, num_streams=1):
+        """Trains every member on the examples, as SRN.train does.
+
+        Returns an array with the total training error of each member."""
+        inputs = as_examples(inputs, self.dtype)
+        targets = as_examples(targets, self.dtype)
+        if self.context.shape[1] != num_streams:
+            self.reset(num_streams)
+        inputs, targets, mask = split_streams(inputs, targets, num_streams, self.dtype)
+        w = self.weights
+        history = deque(maxlen=self.backprop_ticks)
+        error = np.zeros(len(self))
+        for x, t, m in zip(inputs, targets, mask):
+            t = dense(t, self.num_output, self.dtype)
+            hidden, out = self._forward(x, self.context)
+            error += (cross_entropy(out, t) * m[:, 0]).sum(-1)
+            history.appendleft((x, self.context))
+
+            d_out = (out - t) * m
+            grads = {'hidden_output': hidden.transpose(0, 2, 1) @ d_out,
+                     'output_bias': d_out.sum(1),
+                     'input_hidden': 0., 'context_hidden': 0., 'hidden_bias': 0.}
+            d_hidden = (d_out @ w['hidden_output'].transpose(0, 2, 1)) * hidden * (1 - hidden)
+            for x_k, context_k in history:
+                grads['input_hidden'] = grads['input_hidden'] + self._input_grad(x_k, d_hidden)
+                grads['context_hidden'] = (grads['context_hidden']
+                                           + context_k.transpose(0, 2, 1) @ d_hidden)
+                grads['hidden_bias'] = grads['hidden_bias'] + d_hidden.sum(1)
+                d_hidden = ((d_hidden @ w['context_hidden'].transpose(0, 2, 1))
+                            * context_k * (1 - context_k))
+
+            self._update(grads)
+            self.context = np.where(m > 0, hidden, self.context)
+        return error
+
+    def test(self, inputs, targets):
+        """Returns a list with the SRN.test results of each member.
+
+        Like SRN.test, leaves the context unchanged."""
+        inputs = as_examples(inputs, self.dtype)
+        targets = dense(as_examples(targets, self.dtype), self.num_output, self.dtype)
+        w = self.weights
+        net_input = self._project(inputs) + w['hidden_bias'][:, None]
+        hidden = np.empty((len(self), len(inputs), self.num_hidden), self.dtype)
+        context = np.full((len(self), 1, self.num_hidden), INIT_OUTPUT, self.dtype)
+        for i in range(len(inputs)):
+            context = logistic(net_input[:, i:i+1] + context @ w['context_hidden'])
+            hidden[:, i:i+1] = context
+        out = logistic(hidden @ w['hidden_output'] + w['output_bias'][:, None])
+
+        errors = cross_entropy(out, targets).sum(-1, dtype=float)
+        num_examples = max(len(inputs), 1)
+        return [{'error_total': error,
+                 'error_per_example': error / num_examples,
+                 'error_per_tick': error / num_examples,
+                 'unit_cost_per_tick': 0.,
+                 'out_activations': activations}
+                for error, activations in zip(errors, out)]
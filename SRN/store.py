@@ -0,0 +1,240 @@
+"""Columnar store of run_net results.
+
+A store is a directory of parts, each holding the results of one or more
+nets. A part is a directory with the files of each column, so reading a
+column never touches the others:
+
+  scalar columns (numbers, strings, bools): <column>.npy, one value per net.
+  array columns (activations, boundaries, trial errors): the arrays of
+    every net flattened into <column>.values.npy, with <column>.offsets.npy
+    marking where each net's values start and <column>.shapes.npy holding
+    their shapes, as in Arrow's list layout.
+
+All files are loaded as read-only memory maps, so only the values that are
+used are read from disk. schema.json lists the columns of a part and their
+kinds. Results don't need to have the same keys: values missing from a
+integer or float scalar column are stored as NaN, and other missing values are
+marked in <column>.valid.npy and read back as None.
+
+Parts are written to a temporary directory and renamed into place, so a
+part is either complete or absent. Results can be appended by several
+processes while others read the store, and a crash loses at most the parts
+that were being written. Parts are numbered in the order they are
+appended, and reads see the parts that exist when they start, in order.
+"""
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+RESULTS_DIR = 'results'
+SCHEMA_FILE = 'schema.json'
+PART_NAME = '%012d'  # zero padded, so parts sort in the order they were added
+
+
+def _is_scalar(values):
+    return all(np.ndim(value) == 0 for value in values)
+
+
+def _fill(values, valid, fill_value, dtype):
+    """Returns an array of the valid values, with fill_value in the other rows."""
+    column = np.full(len(valid), fill_value, dtype)
+    column[valid] = values
+    return column
+
+
+def _write_part(results, directory):
+    """Writes a list of result dicts as the columns of a part in directory.
+
+    Array columns are copied into the values file one net at a time, so
+    results holding memory maps are never loaded into memory at once."""
+    names = sorted({name for result in results for name in result})
+    schema = {'num_rows': len(results), 'columns': {}}
+    for name in names:
+        valid = np.array([result.get(name) is not None for result in results])
+        values = [result[name] for result in results if result.get(name) is not None]
+        path = os.path.join(directory, name)
+        if _is_scalar(values):
+            schema['columns'][name] = 'scalar'
+            column = np.array(values)
+            if column.dtype == object:
+                raise ValueError('column %s has values of mixed types' % name)
+            if not valid.all():
+                if column.dtype.kind in 'iuf':
+                    column = _fill(column, valid, np.nan, float)
+                else:
+                    # Strings and bools keep their dtype, filled with '' or False.
+                    column = _fill(column, valid, column.dtype.type(), column.dtype)
+                    np.save(path + '.valid.npy', valid)
+            np.save(path + '.npy', column)
+        else:
+            schema['columns'][name] = 'array'
+            arrays = [np.asarray(value) for value in values]
+            ndim = max(array.ndim for array in arrays)
+            shapes = np.zeros((len(valid), ndim), np.int64)
+            shapes[valid] = [(1,) * (ndim - array.ndim) + array.shape for array in arrays]
+            sizes = _fill([array.size for array in arrays], valid, 0, np.int64)
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            column = np.lib.format.open_memmap(path + '.values.npy', mode='w+',
+                                               dtype=np.result_type(*arrays),
+                                               shape=(int(offsets[-1]),))
+            for array, start in zip(arrays, offsets[:-1][valid]):
+                column[start:start + array.size] = array.ravel()
+            column.flush()
+            del column
+            np.save(path + '.offsets.npy', offsets)
+            np.save(path + '.shapes.npy', shapes)
+            if not valid.all():
+                np.save(path + '.valid.npy', valid)
+    with open(os.path.join(directory, SCHEMA_FILE), 'w') as f:
+        json.dump(schema, f)
+
+
+def write(results, directory=RESULTS_DIR):
+    """Writes a list of result dicts (see main.run_net) as a new store.
+
+    The store is written to a temporary directory which then replaces
+    directory. Results appended to directory in the meantime are lost.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    os.mkdir(os.path.join(tmp, PART_NAME % 0))
+    _write_part(results, os.path.join(tmp, PART_NAME % 0))
+
+    old = None
+    if os.path.isdir(directory):
+        old = tempfile.mkdtemp(dir=parent, prefix='.old-')
+        os.rename(directory, os.path.join(old, 'store'))
+    os.rename(tmp, directory)
+    if old is not None:
+        shutil.rmtree(old)
+
+
+def append(results, directory=RESULTS_DIR):
+    """Adds a result dict, or a list of them, to a store as a new part.
+
+    The part is numbered after the last part in the store. Processes that
+    append at the same time get different numbers.
+
+    Returns the name of the part.
+    """
+    if isinstance(results, dict):
+        results = [results]
+    os.makedirs(directory, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=directory, prefix='.tmp-')
+    try:
+        _write_part(results, tmp)
+        while True:
+            numbers = [int(name) for name in parts(directory) if name.isdigit()]
+            name = PART_NAME % (max(numbers, default=-1) + 1)
+            try:
+                # Fails if another process has just added a part with the number.
+                os.rename(tmp, os.path.join(directory, name))
+                return name
+            except OSError:
+                if not os.path.isdir(os.path.join(directory, name)):
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def compact(directory=RESULTS_DIR):
+    """Rewrites a store as a single part, which is faster to read.
+
+    Don't compact a store that results are still being appended to."""
+    write(read_results(directory), directory)
+
+
+def parts(directory=RESULTS_DIR):
+    """Returns the names of the complete parts of a store, in order."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if not name.startswith('.'))
+
+
+def _load_schemas(directory, names):
+    schemas = []
+    for name in names:
+        with open(os.path.join(directory, name, SCHEMA_FILE), 'r') as f:
+            schemas.append((os.path.join(directory, name), json.load(f)))
+    return schemas
+
+
+def read_schema(directory=RESULTS_DIR):
+    """Returns {column: 'scalar' or 'array'} for the columns of a store."""
+    kinds = {}
+    for _, schema in _load_schemas(directory, parts(directory)):
+        kinds.update(schema['columns'])
+    return kinds
+
+
+def _read_part_column(path, schema, name):
+    path = os.path.join(path, name)
+    kind = schema['columns'].get(name)
+    if kind is None:
+        return [None] * schema['num_rows']
+    valid = None
+    if os.path.isfile(path + '.valid.npy'):
+        valid = np.load(path + '.valid.npy')
+    if kind == 'scalar':
+        column = np.load(path + '.npy', mmap_mode='r')
+        if valid is not None:
+            column = np.array(column, dtype=object)
+            column[~valid] = None
+        return column
+    values = np.load(path + '.values.npy', mmap_mode='r')
+    offsets = np.load(path + '.offsets.npy')
+    shapes = np.load(path + '.shapes.npy')
+    column = [values[start:end].reshape(shape)
+              for start, end, shape in zip(offsets[:-1], offsets[1:], shapes)]
+    if valid is not None:
+        column = [value if is_valid else None for value, is_valid in zip(column, valid)]
+    return column
+
+
+def _concatenate(columns):
+    if not columns:
+        return []
+    if len(columns) == 1:
+        return columns[0]
+    if all(isinstance(column, np.ndarray) for column in columns):
+        return np.concatenate(columns)
+    return [value for column in columns for value in column]
+
+
+def read_column(directory, name, names=None):
+    """Returns a column: an array of scalars, or a list with each net's array.
+
+    Args:
+      names: the parts to read, by default all of them.
+    """
+    schemas = _load_schemas(directory, parts(directory) if names is None else names)
+    return _concatenate([_read_part_column(path, schema, name) for path, schema in schemas])
+
+
+def read_table(directory=RESULTS_DIR, columns=None, names=None):
+    """Returns {column: column} for columns, by default every scalar column.
+
+    Values of columns that a part doesn't have are None."""
+    schemas = _load_schemas(directory, parts(directory) if names is None else names)
+    if columns is None:
+        kinds = {}
+        for _, schema in schemas:
+            kinds.update(schema['columns'])
+        columns = [name for name, kind in sorted(kinds.items()) if kind == 'scalar']
+    return {name: _concatenate([_read_part_column(path, schema, name)
+                                for path, schema in schemas])
+            for name in columns}
+
+
+def read_results(directory=RESULTS_DIR, names=None):
+    """Returns the list of result dicts in the store, or in the named parts."""
+    results = []
+    for path, schema in _load_schemas(directory, parts(directory) if names is None else names):
+        columns = {name: _read_part_column(path, schema, name) for name in schema['columns']}
+        results.extend({name: column[i] for name, column in columns.items()}
+                       for i in range(schema['num_rows']))
+    return results
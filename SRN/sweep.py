@@ -0,0 +1,130 @@
+"""Runs a grid of networks across one process pool, with checkpointing."""
+import itertools
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import corpora
+import store
+import utils
+from main import run_net
+from network import Network
+
+
+def make_grid(langs=('english', 'danish'), seeds=range(1), num_hidden=(80,),
+              learning_rate=(0.1,), distributed=(False,)):
+    """Returns [dict]: one job for every combination of the arguments."""
+    keys = ['lang', 'seed', 'num_hidden', 'learning_rate', 'distributed']
+    values = itertools.product(langs, seeds, num_hidden, learning_rate, distributed)
+    return [dict(zip(keys, combination)) for combination in values]
+
+
+def job_name(job):
+    """Returns a name which uniquely identifies job within a grid."""
+    return '%s_s%s_h%s_r%s_%s' % (job['lang'], job['seed'], job['num_hidden'],
+                                  job['learning_rate'], 'd' if job['distributed'] else 'l')
+
+
+def job_cost(job, num_train):
+    """Returns the approximate number of multiply-adds needed to train job."""
+    num_units = len(corpora.get_encoding_matrix(distributed=job['distributed'])[0])
+    hidden = job['num_hidden']
+    # input -> hidden, context -> hidden and hidden -> output weights.
+    return num_train * hidden * (2 * num_units + hidden)
+
+
+def run_job(job, num_train, num_test, **kwargs):
+    """Trains and evaluates the net for one job. kwargs are passed to Network."""
+    net = Network(job['seed'], job['num_hidden'], job['learning_rate'],
+                  distributed=job['distributed'], **kwargs)
+    return run_net(net, job['lang'], num_train, num_test, name=job_name(job))
+
+
+def append_job(job, num_train, num_test, directory, timed=False, **kwargs):
+    """Runs job and appends its result to the store in directory.
+
+    The result is written by the worker, so it never has to be sent back to
+    the process running the sweep.
+
+    Returns the job's stage timings (see utils.get_timings) if timed is
+    True, else None.
+    """
+    if timed:
+        utils.enable_timings()
+        utils.reset_timings()  # workers run many jobs
+    result = run_job(job, num_train, num_test, **kwargs)
+    with utils.timed('result write'):
+        store.append(result, directory)
+    if timed:
+        return utils.get_timings()
+
+
+def run_sweep(jobs, num_train, num_test, directory=store.RESULTS_DIR, n_jobs=None,
+              timings_file=None, **kwargs):
+    """Runs every job that doesn't have results in the store in directory yet.
+
+    Jobs are submitted to one process pool, most expensive first. Each
+    worker appends its result to the store as soon as the net is evaluated,
+    so the store can be read while the sweep runs, and a crash only loses
+    the jobs that were running. A failed job is logged and skipped, so
+    running the sweep again retries only the jobs without results. Jobs are
+    matched to results by the name column (see job_name), so the store may
+    be compacted between runs.
+
+    If timings_file is given, the time spent in each stage (see utils.timed)
+    is summed over all workers and written to it as JSON, or as CSV if its
+    name ends with .csv.
+
+    Returns [dict]: results of the finished jobs, in the order of jobs.
+      Their arrays are memory mapped from the store.
+    """
+    done = finished_jobs(directory)
+    todo = [job for job in jobs if job_name(job) not in done]
+    todo.sort(key=lambda job: job_cost(job, num_train), reverse=True)
+    logging.info('running %s of %s jobs' % (len(todo), len(jobs)))
+
+    timed = timings_file is not None
+    if timed:
+        utils.enable_timings()
+    with ProcessPoolExecutor(n_jobs) as pool:
+        futures = {pool.submit(append_job, job, num_train, num_test, directory, timed,
+                               **kwargs): job
+                   for job in todo}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                timings = future.result()
+            except Exception:
+                logging.error('job %s failed:\n%s' % (job_name(job), traceback.format_exc()))
+                continue
+            if timed:
+                utils.merge_timings(timings)
+            logging.info('finished ' + job_name(job))
+
+    if timed:
+        utils.write_timings(timings_file)
+    return load_results(jobs, directory)
+
+
+def finished_jobs(directory=store.RESULTS_DIR):
+    """Returns the set of names of the jobs with results in the store."""
+    return set(store.read_column(directory, 'name')) - {None}
+
+
+def load_results(jobs, directory=store.RESULTS_DIR):
+    """Returns [dict]: stored results for jobs, skipping unfinished ones."""
+    results = {result['name']: result for result in store.read_results(directory)}
+    return [results[job_name(job)] for job in jobs if job_name(job) in results]
+
+
+def main(num_nets=1, num_train=50000, num_test=1000, timings_file=None, **kwargs):
+    """Runs the default sweep. kwargs (e.g. backend) are passed to every Network."""
+    jobs = make_grid(langs=['english', 'danish'], seeds=range(num_nets),
+                     distributed=(False, ))
+    # Each net's results are appended to the store as soon as it finishes.
+    run_sweep(jobs, num_train, num_test, store.RESULTS_DIR, timings_file=timings_file,
+              **kwargs)
+
+
+if __name__ == '__main__':
+    main()
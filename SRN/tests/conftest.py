@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules in SRN import each other as top level modules, and read their
+# data files relative to SRN.
+SRN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRN_DIR)
+os.chdir(SRN_DIR)
@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import cache
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.txt'
+    path.write_text('abc')
+    return str(path)
+
+
+def test_hit_and_miss(tmp_path, source):
+    cache_dir = str(tmp_path / 'cache')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'x': np.arange(10)}
+
+    first = cache.cached(compute, [source], {'n': 10}, cache_dir)
+    second = cache.cached(compute, [source], {'n': 10}, cache_dir)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(first['x'], second['x'])
+    assert isinstance(second['x'], np.memmap)
+
+    cache.cached(compute, [source], {'n': 11}, cache_dir)
+    assert len(calls) == 2
+    with open(source, 'a') as f:
+        f.write('d')
+    os.utime(source, (0, 0))  # a new mtime, even on coarse clocks
+    cache.cached(compute, [source], {'n': 10}, cache_dir)
+    assert len(calls) == 3
+
+
+def test_version_changes_key(source):
+    assert (cache.make_key([source], {'version': 1})
+            != cache.make_key([source], {'version': 2}))
+
+
+def test_evicts_least_recently_used(tmp_path, source):
+    cache_dir = str(tmp_path / 'cache')
+    size = np.zeros(1000).nbytes
+    keys = []
+    for i in range(3):
+        keys.append(cache.make_key([source], {'i': i}))
+        cache.store(keys[-1], {'x': np.zeros(1000)}, cache_dir, max_bytes=10 * size)
+        os.utime(os.path.join(cache_dir, keys[-1]), (i, i))
+    cache.load(keys[0], cache_dir)  # now the most recently used
+
+    cache.evict(2.5 * size, cache_dir)
+    assert cache.load(keys[0], cache_dir) is not None
+    assert cache.load(keys[1], cache_dir) is None
+    assert cache.load(keys[2], cache_dir) is not None
+    assert not [name for name in os.listdir(cache_dir) if name.startswith('.')]
+
+
+def _use_cache(cache_dir, source, seed, num_calls=100):
+    rng = np.random.RandomState(seed)
+    for _ in range(num_calls):
+        n = rng.randint(20)
+        arrays = cache.cached(lambda: {'x': np.arange(1000) + n}, [source], {'n': n},
+                              cache_dir, max_bytes=4 * np.arange(1000).nbytes)
+        assert arrays['x'][0] == n
+
+
+def test_concurrent_eviction(tmp_path, source):
+    cache_dir = str(tmp_path / 'cache')
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(8, mp_context=context) as pool:
+        futures = [pool.submit(_use_cache, cache_dir, source, seed) for seed in range(8)]
+        for future in futures:
+            future.result()
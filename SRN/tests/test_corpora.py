@@ -0,0 +1,58 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import corpora
+import main
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return corpora.get_corpus('english', word_boundaries=True)[:5000]
+
+
+def assert_split_equal(phones, bounds, expected):
+    """Compares arrays from stream_split to (phone, bound) pairs from train_test_split."""
+    expected_phones, expected_bounds = zip(*expected)
+    np.testing.assert_array_equal(phones, corpora.to_indices(''.join(expected_phones)))
+    np.testing.assert_array_equal(bounds, expected_bounds)
+
+
+@pytest.mark.parametrize('mode', ['begin', 'end', 'random'])
+def test_stream_split_matches_list_split(corpus, mode):
+    random.seed(0)
+    train, test = corpora.train_test_split(main.extract_boundaries(corpus), 2000, 500, mode)
+    random.seed(0)
+    train_chunks, (test_phones, test_bounds) = corpora.stream_split(
+        lambda: corpora.boundary_chunks(corpus, chunk_size=97), 2000, 500, mode,
+        chunk_size=300)
+
+    chunks = list(train_chunks)
+    assert [len(phones) for phones, _ in chunks] == [300] * 6 + [200]
+    train_phones, train_bounds = map(np.concatenate, zip(*chunks))
+    assert_split_equal(train_phones, train_bounds, train)
+    assert_split_equal(test_phones, test_bounds, test)
+
+
+def test_stream_split_reads_only_needed_rows():
+    # The length check would never finish on an endless stream.
+    chunk = np.arange(10, dtype=np.uint8), np.zeros(10, dtype=bool)
+    train_chunks, (test_phones, _) = corpora.stream_split(
+        lambda: itertools.repeat(chunk), 25, 10, chunk_size=10)
+    assert [len(phones) for phones, _ in train_chunks] == [10, 10, 5]
+    np.testing.assert_array_equal(test_phones, [5, 6, 7, 8, 9, 0, 1, 2, 3, 4])
+
+
+def test_stream_split_too_short(corpus):
+    with pytest.raises(ValueError):
+        corpora.stream_split(lambda: corpora.boundary_chunks(corpus[:100]), 100, 10)
+
+
+@pytest.mark.parametrize('distributed', [True, False])
+def test_encoding_matrix_is_read_only(distributed):
+    # The matrix is cached and shared, so callers mustn't be able to change it.
+    matrix = corpora.get_encoding_matrix(distributed=distributed)
+    with pytest.raises(ValueError):
+        matrix[0, 0] = 2
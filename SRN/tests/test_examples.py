@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import examples
+
+RNG = np.random.RandomState(0)
+DENSE = RNG.rand(25, 3).astype(np.float32), RNG.rand(25, 4).astype(np.float32)
+SPARSE = RNG.randint(3, size=25), RNG.randint(4, size=25)
+
+
+@pytest.mark.parametrize('extension', ['.ex', '.ex.gz'])
+@pytest.mark.parametrize('inputs, targets', [DENSE, SPARSE, (SPARSE[0], DENSE[1]),
+                                             (DENSE[0], SPARSE[1])],
+                         ids=['dense', 'sparse', 'sparse inputs', 'sparse targets'])
+def test_text_round_trip(tmp_path, extension, inputs, targets):
+    path = str(tmp_path / ('examples' + extension))
+    # Enough examples for several chunks.
+    examples.CHUNK_SIZE, chunk_size = 10, examples.CHUNK_SIZE
+    try:
+        examples.write_text(path, inputs, targets)
+    finally:
+        examples.CHUNK_SIZE = chunk_size
+
+    read_inputs, read_targets = examples.read_text(path)
+    for read, written in [(read_inputs, inputs), (read_targets, targets)]:
+        assert read.dtype.kind == written.dtype.kind
+        # %.9g round trips float32 exactly.
+        np.testing.assert_array_equal(read.astype(written.dtype), written)
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_binary_round_trip(tmp_path, mmap):
+    path = str(tmp_path / 'examples.bex')
+    examples.write_binary(path, *DENSE)
+    inputs, targets = examples.read_binary(path, mmap)
+    assert inputs.dtype == targets.dtype == np.float32
+    np.testing.assert_array_equal(inputs, DENSE[0])
+    np.testing.assert_array_equal(targets, DENSE[1])
+
+
+def test_read_binary_rejects_other_files(tmp_path):
+    path = str(tmp_path / 'examples.ex')
+    examples.write_text(path, *DENSE)
+    with pytest.raises(ValueError):
+        examples.read_binary(path)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import experiment
+
+
+@pytest.fixture
+def trials():
+    rng = np.random.RandomState(0)
+    # Errors of 3 nets for the two words of 20 trials, and the answers.
+    trial_errors = rng.rand(3, 20, 2) + 0.5
+    key = rng.randint(2, size=20)
+    return trial_errors, key
+
+
+def test_expected_accuracy_matches_simulation(trials):
+    trial_errors, key = trials
+    mean, variance, _, _ = experiment.expected_accuracy(trial_errors, key=key)
+    _, _, accuracy = experiment.simulate_choices(trial_errors, num_subjects=20000, seed=0,
+                                                 key=key)
+    np.testing.assert_allclose(accuracy.mean(-1), mean, atol=0.005)
+    np.testing.assert_allclose(accuracy.var(-1), variance, rtol=0.05)
+
+
+@pytest.mark.parametrize('relative', [True, False])
+def test_expected_accuracy_gradients(trials, relative):
+    trial_errors, key = trials
+    k, h = 3., 1e-5
+    _, _, d_mean, d_variance = experiment.expected_accuracy(trial_errors, k, relative, key)
+    above = experiment.expected_accuracy(trial_errors, k + h, relative, key)
+    below = experiment.expected_accuracy(trial_errors, k - h, relative, key)
+    np.testing.assert_allclose(d_mean, (above[0] - below[0]) / (2 * h), rtol=1e-6)
+    np.testing.assert_allclose(d_variance, (above[1] - below[1]) / (2 * h), rtol=1e-5)
+
+
+def test_fit_steepness_recovers_k(trials):
+    trial_errors, key = trials
+    accuracy = experiment.expected_accuracy(trial_errors, 3, key=key)[0]
+    assert experiment.fit_steepness(trial_errors, accuracy, key=key) == pytest.approx(3, rel=0.01)
+
+
+def test_simulate_choices_is_reproducible(trials):
+    trial_errors, key = trials
+    first = experiment.simulate_choices(trial_errors, num_subjects=5, seed=1, key=key)
+    second = experiment.simulate_choices(trial_errors, num_subjects=5, seed=1, key=key)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_simulate_choices_shapes(trials):
+    trial_errors, key = trials
+    choices, reaction_times, accuracy = experiment.simulate_choices(
+        trial_errors, num_subjects=4, seed=0, key=key)
+    assert choices.shape == (3, 4, 20)
+    assert reaction_times.shape == (3, 20)
+    assert accuracy.shape == (3, 4)
+
+    # A (trials, 2) array is one net.
+    choices, reaction_times, accuracy = experiment.simulate_choices(
+        trial_errors[0], num_subjects=4, seed=0, key=key)
+    assert choices.shape == (1, 4, 20)
+    assert reaction_times.shape == (1, 20)
+    assert accuracy.shape == (1, 4)
+
+
+def test_simulate_choices_agrees_with_get_network_choices():
+    # Differences of 200 make the choices of both rules all but certain.
+    rng = np.random.RandomState(0)
+    trial_errors = np.where(rng.rand(50, 1) < 0.5, [[300., 100.]], [[100., 300.]])
+    key = np.zeros(50, int)
+    choices, reaction_times, _ = experiment.simulate_choices(trial_errors, k=0.1, seed=0,
+                                                             relative=False, key=key)
+    expected_choices, expected_times = experiment.get_network_choices(trial_errors)
+    np.testing.assert_array_equal(choices[0, 0], expected_choices)
+    np.testing.assert_allclose(reaction_times[0], expected_times)
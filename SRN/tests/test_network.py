@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+import lens
+import main
+import network
+import utils
+from network import LensSession, Network, NetworkPopulation, read_text_activations
+
+LENS_STATS = ('Error total:       1.500000\nError per example: 0.300000\n'
+              'Error per tick:    0.300000\nUnit cost per tick: 0.000000\n')
+
+UPDATE_HEADER = '__Update____Error___UnitCost__Wgt.Cost__Grad.Lin__TimeUsed__TimeLeft__\n'
+UPDATE = ' %6d)   %.5f   0.00000   107959   -0.02885        0s        0s\n'
+
+
+class FakeLensSession(LensSession):
+    """Answers the command blocks of a LensSession as Lens would."""
+    def __init__(self, activations=None):
+        self.weight_file = None
+        self.activations = activations
+        self.commands = []
+        self.closed = False
+
+    def _run(self, commands):
+        self.commands.append(commands)
+        match = re.search(r'set acts \[open (\S+) r\+\]', commands)
+        if match:
+            offset = int(re.search(r'seek \$acts (\d+)', commands).group(1))
+            # binary format r writes little endian single precision floats.
+            with open(match.group(1), 'r+b') as f:
+                f.seek(offset)
+                f.write(self.activations.astype('<f4').tobytes())
+        out = LENS_STATS * commands.split('\n').count('test')
+        match = re.search(r'setObj num_updates (\d+)\ntrain', commands)
+        if match:
+            out += UPDATE_HEADER + ''.join(UPDATE % (i + 1, 0.5 * (i + 1))
+                                           for i in range(int(match.group(1))))
+        return out
+
+    def close(self):
+        self.closed = True
+
+
+TRIAL = np.eye(3)[[0, 1, 2, 0, 1]], np.eye(4)[[1, 2, 3, 0, 1]]
+
+
+@pytest.fixture
+def lens_net(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    net = Network(backend='lens')
+    net.num_input, net.num_output = 3, 4
+    return net
+
+
+def test_session_test_output_is_parsed(lens_net):
+    activations = np.random.RandomState(0).rand(5, 4)
+    lens_net._session = FakeLensSession(activations)
+    inputs, targets = TRIAL
+
+    result = lens_net.test(inputs, targets)
+
+    # Commands are sent verbatim, so no % escapes may be left in them.
+    assert '%%' not in lens_net._session.commands[0]
+    assert result['error_total'] == 1.5
+    assert result['error_per_example'] == pytest.approx(0.3)
+    np.testing.assert_allclose(result['out_activations'], activations, rtol=1e-6)
+
+
+def test_test_many_keeps_open_session(lens_net):
+    session = lens_net._session = FakeLensSession()
+    np.testing.assert_array_equal(lens_net.test_many([TRIAL, TRIAL]), [1.5, 1.5])
+    np.testing.assert_array_equal(lens_net.fit_trials([TRIAL]), [7.5])
+    assert lens_net._session is session and not session.closed
+
+
+def test_test_many_closes_session_it_opened(lens_net, monkeypatch):
+    sessions = []
+
+    def start_session(*args):
+        sessions.append(FakeLensSession())
+        return sessions[-1]
+    monkeypatch.setattr(network, 'LensSession', start_session)
+    monkeypatch.setattr(lens_net, '_format_template', lambda *files: '')
+
+    lens_net.test_many([TRIAL])
+    assert lens_net._session is None and sessions[0].closed
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_evaluate_net_opens_one_session_per_net(lens_net, monkeypatch, parallel):
+    sessions = []
+
+    def start_session(*args):
+        sessions.append(FakeLensSession(np.zeros((5, 4))))
+        return sessions[-1]
+    monkeypatch.setattr(network, 'LensSession', start_session)
+    monkeypatch.setattr(Network, '_format_template', lambda self, *files: '')
+    experiment_sessions = []
+
+    def run_experiment(net, lang, exp):
+        experiment_sessions.append(net._session)
+        return list(net.test_many([TRIAL]))
+    monkeypatch.setattr(main, 'run_experiment', run_experiment)
+    lens_net.distributed = False
+    open(lens_net.weight_file, 'w').close()
+
+    result = main.evaluate_net(lens_net, 'english', TRIAL, np.zeros(5, bool), 'net',
+                               parallel)
+
+    # The test and experiment A share a session, experiment B has its own.
+    assert sorted(map(id, experiment_sessions)) == sorted(map(id, sessions))
+    assert len(sessions) == 2
+    assert all(session.closed for session in sessions)
+    assert sorted(len(session.commands) for session in sessions) == [1, 2]
+    assert result['exp_a_errors'] == result['exp_b_errors'] == [1.5]
+
+
+def test_run_population_names_members(monkeypatch):
+    inputs, targets = TRIAL
+    monkeypatch.setattr(main, 'get_corpora', lambda *args, **kwargs:
+                        ((inputs, targets), (inputs, targets), np.zeros(5, bool)))
+    monkeypatch.setattr(main, 'evaluate_net', lambda net, lang, test, bounds, name: name)
+    population = NetworkPopulation([0, 0, 1], num_hidden=4, learning_rate=[0.1, 0.2, 0.1],
+                                   distributed=False)
+    with pytest.raises(RuntimeError):
+        population.networks()
+
+    names = main.run_population(population, 'english', 5, 5)
+    assert names == ['english_m0_s0_h4_r0.1_l', 'english_m1_s0_h4_r0.2_l',
+                     'english_m2_s1_h4_r0.1_l']
+
+
+def test_fit_trials_scores_training_pass(lens_net):
+    session = lens_net._session = FakeLensSession()
+    sunk = []
+
+    def sink(i, error):
+        sunk.append((i, error, len(session.commands)))
+    short_trial = TRIAL[0][:3], TRIAL[1][:3]
+    errors = lens_net.fit_trials([TRIAL, short_trial], sink)
+
+    # Each trial is scored by the updates of its one training pass.
+    np.testing.assert_array_equal(errors, [7.5, 3.])
+    assert not any('test' in commands.split('\n') for commands in session.commands)
+    # The sink gets each error before the next trial is sent.
+    assert sunk == [(0, 7.5, 1), (1, 3., 2)]
+    assert 'saveWeights' in session.commands[-1]
+
+
+def test_read_text_activations(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('lens')
+    lens.write_lens_files('net', 0, 3, 2, 4, 10, 0.1, 0.95, 1, 0.25)
+    with open('lens/testing.in') as f:
+        assert 'format "%f "' in f.read()
+
+    # The output of the printOutputs procedure in the test script.
+    activations = np.random.RandomState(0).rand(5, 4)
+    with open('segmentation.out', 'w') as f:
+        f.write('\n' + ''.join(''.join('%f ' % value for value in row) + '\n'
+                               for row in activations))
+    np.testing.assert_allclose(read_text_activations('segmentation.out', 4), activations,
+                               atol=1e-6)
+
+
+def test_restore_unfit_snapshot():
+    net = Network(num_hidden=5, backend='numpy')
+    snapshot = net.snapshot()
+    assert snapshot is None
+    inputs, targets = np.eye(4)[[0, 1, 2, 3, 0]], np.eye(4)[[1, 2, 3, 0, 1]]
+    net.fit(inputs, targets)
+    fit_error = net.test(inputs, targets)['error_total']
+
+    net.restore(snapshot)
+    with pytest.raises(RuntimeError):
+        net.test(inputs, targets)
+    net.fit(inputs, targets)
+    assert net.test(inputs, targets)['error_total'] == fit_error
+
+
+def test_snapshot_restore():
+    net = Network(num_hidden=5, backend='numpy')
+    inputs, targets = np.eye(4)[[0, 1, 2, 3, 0]], np.eye(4)[[1, 2, 3, 0, 1]]
+    net.fit(inputs, targets)
+    snapshot = net.snapshot()
+    error = net.test(inputs, targets)['error_total']
+    net.fit(inputs, targets)
+    assert net.test(inputs, targets)['error_total'] != error
+    net.restore(snapshot)
+    assert net.test(inputs, targets)['error_total'] == error
+
+
+def test_softmax_output_rejects_distributed():
+    with pytest.raises(ValueError):
+        Network(backend='numpy', output='softmax', distributed=True)
+    with pytest.raises(ValueError):
+        NetworkPopulation([0, 1], output='softmax')
+
+
+FAKE_LENS = '''#!%s
+import sys
+# Runs the echo commands of a Lens script.
+with open(sys.argv[2]) as f:
+    for line in f:
+        if line.startswith('echo '):
+            print(line[5:].strip(), flush=True)
+'''
+
+
+def test_run_lens_times_launch(lens_net, tmp_path, monkeypatch):
+    fake_lens = tmp_path / 'lens'
+    fake_lens.write_text(FAKE_LENS % sys.executable)
+    fake_lens.chmod(0o755)
+    monkeypatch.setattr(network, 'LENS_LOCATION', str(fake_lens))
+    monkeypatch.setattr(lens_net, '_format_template',
+                        lambda file: 'echo built' if file == 'architecture.in'
+                        else 'echo trained\necho success')
+    utils.enable_timings()
+    utils.reset_timings()
+    try:
+        lens_net.fit(*TRIAL)
+        timings = utils.get_timings()
+    finally:
+        utils.disable_timings()
+
+    assert timings['engine launch']['count'] == timings['train']['count'] == 1
+    with open(lens_net.dir + 'train.in-log.out') as f:
+        assert f.read() == 'built\ntrained\nsuccess\n'
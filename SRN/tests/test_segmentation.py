@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pytest
+from sklearn import metrics
+
+import benchmark
+import segmentation
+
+
+@pytest.fixture
+def predictions():
+    rng = np.random.RandomState(0)
+    correct = rng.rand(2000) < 0.3
+    # Activations of 5 nets, rounded so that some of them are tied.
+    break_outs = np.round(rng.rand(2000, 5) * 0.5 + 0.4 * correct[:, None], 2)
+    return correct, break_outs
+
+
+def test_scores_match_original(predictions):
+    correct, break_outs = predictions
+    results = segmentation.score_segmentations(correct, break_outs)
+    for result, break_out in zip(results, break_outs.T):
+        predicted = segmentation.get_predicted_word_boundaries(break_out)
+        expected = dict(benchmark.test_boundary_prediction_counter(correct, predicted),
+                        **benchmark.test_word_segmentation_sets(correct, predicted))
+        assert result == pytest.approx(expected)
+
+
+def test_no_hits():
+    correct = np.array([True, False, True, False])
+    result = segmentation.score_segmentations(correct, np.array([[0.], [1.], [0.], [1.]]))[0]
+    assert result == {'boundary_precision': 0, 'boundary_recall': 0, 'boundary_F': 0,
+                      'word_precision': 0, 'word_recall': 0, 'word_F': 0}
+
+
+def test_threshold_sweep_matches_each_threshold(predictions):
+    correct, break_outs = predictions
+    break_out = break_outs[:, 0]
+    sweep = segmentation.threshold_sweep(correct, break_out)
+    np.testing.assert_array_equal(sweep['threshold'], np.unique(break_out))
+
+    for i, threshold in enumerate(sweep['threshold']):
+        predicted = [break_out > threshold]
+        expected = dict(segmentation.score_boundaries(correct, predicted)[0],
+                        **segmentation.score_words(correct, predicted)[0])
+        for name, value in expected.items():
+            assert sweep[name][i] == pytest.approx(value), (name, threshold)
+    assert sweep['boundary_auc'] == pytest.approx(metrics.roc_auc_score(correct, break_out))
+
+
+def test_debug_sinks_write_distinct_files(tmp_path):
+    directory = str(tmp_path / 'debug')
+    sinks = [segmentation.DebugSink(directory) for _ in range(2)]
+    # Both sinks dump under the same name from several threads at once.
+    with ThreadPoolExecutor(4) as executor:
+        futures = list(executor.map(lambda i: sinks[i % 2].dump(i, 'words'), range(20)))
+    for sink in sinks:
+        sink.close()
+
+    # close() waits for every write.
+    assert all(future.done() for future in futures)
+    paths = [future.result() for future in futures]
+    assert len(set(paths)) == 20
+    assert sorted(os.listdir(directory)) == sorted(os.path.basename(path) for path in paths)
+    assert [joblib.load(path) for path in paths] == list(range(20))
+
+
+def test_word_segmentation_writes_only_to_sink(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    correct = np.array([True, False, True, False, True])
+    predicted = np.array([True, False, False, True, True])
+    scores = segmentation.test_word_segmentation(correct, predicted)
+    assert os.listdir(tmp_path) == []
+
+    with segmentation.DebugSink('debug') as sink:
+        assert segmentation.test_word_segmentation(correct, predicted, sink, 'net0') == scores
+    [file] = os.listdir('debug')
+    assert file.startswith('net0-')
+    correct_spans, predicted_spans = joblib.load(os.path.join('debug', file))
+    np.testing.assert_array_equal(correct_spans, segmentation.word_spans(correct))
+    np.testing.assert_array_equal(predicted_spans, segmentation.word_spans(predicted))
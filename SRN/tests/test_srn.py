@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+
+import srn
+from srn import SRN, SRNPopulation
+
+CLASSES = [0, 0, 1, 1, 1, 2]  # of the output units, for hierarchical output
+
+
+def sequence(num_examples, num_units, seed=0):
+    """Returns (inputs, targets) unit indices of a random phoneme sequence."""
+    indices = np.random.RandomState(seed).randint(num_units, size=num_examples + 1)
+    return indices[:-1], indices[1:]
+
+
+def last_error(net, inputs, targets):
+    """Returns the error on the last example of a sequence, from the initial context."""
+    out = net.test(inputs, targets)['out_activations']
+    return net.output_layer.error(out, targets)[-1]
+
+
+@pytest.mark.parametrize('output', ['logistic', 'softmax', 'hierarchical'])
+@pytest.mark.parametrize('backprop_ticks', [1, 2])
+def test_gradients_match_finite_differences(output, backprop_ticks):
+    inputs, targets = sequence(backprop_ticks, 6, seed=3)
+    inputs = np.eye(6)[inputs]
+    # Without momentum the last weight change is -learning_rate * gradient.
+    # The learning rate is small enough that earlier updates don't matter.
+    net = SRN(6, 5, 6, learning_rate=1e-8, momentum=0., backprop_ticks=backprop_ticks,
+              seed=2, output=output, classes=CLASSES)
+    initial = net.snapshot()
+    net.train(inputs, targets)
+    grads = {name: -delta / net.learning_rate for name, delta in net.deltas.items()}
+    net.restore(initial)
+
+    epsilon = 1e-6
+    for name, weights in net.weights.items():
+        numeric = np.zeros_like(weights)
+        for i in np.ndindex(weights.shape):
+            weights[i] += epsilon
+            up = last_error(net, inputs, targets)
+            weights[i] -= 2 * epsilon
+            down = last_error(net, inputs, targets)
+            weights[i] += epsilon
+            numeric[i] = (up - down) / (2 * epsilon)
+        np.testing.assert_allclose(grads[name], numeric, rtol=1e-4, atol=1e-6,
+                                   err_msg=name)
+
+
+@pytest.mark.parametrize('sparse', [False, True])
+def test_population_matches_independent_srns(sparse):
+    inputs, targets = sequence(300, 6)
+    if not sparse:
+        inputs, targets = np.eye(6)[inputs], np.eye(6)[targets]
+    seeds, rates, ranges = [0, 1, 2], [0.1, 0.2, 0.05], [0.25, 0.5, 0.1]
+    population = SRNPopulation(seeds, 6, 5, 6, learning_rate=rates, momentum=0.9,
+                               backprop_ticks=2, rand_range=ranges)
+    nets = [SRN(6, 5, 6, rate, 0.9, 2, rand_range, seed)
+            for seed, rate, rand_range in zip(seeds, rates, ranges)]
+
+    errors = population.train(inputs, targets, num_streams=4)
+    np.testing.assert_allclose(errors, [net.train(inputs, targets, 4) for net in nets])
+    for i, (result, net) in enumerate(zip(population.test(inputs, targets), nets)):
+        expected = net.test(inputs, targets)
+        np.testing.assert_allclose(result['error_total'], expected['error_total'])
+        np.testing.assert_allclose(result['out_activations'], expected['out_activations'])
+        member = population.member(i)
+        for name in net.weights:
+            np.testing.assert_allclose(member.weights[name], net.weights[name])
+
+
+def test_dense():
+    rows = np.array([2, 0, 1])
+    np.testing.assert_array_equal(srn.dense(rows, 4), np.eye(4)[rows])
+    assert srn.dense(rows, 4, 'float32').dtype == np.float32
+    matrix = np.eye(3)
+    assert srn.dense(matrix, 3) is matrix
+
+
+def test_sparse_matches_dense():
+    inputs, targets = sequence(200, 6)
+    sparse = SRN(6, 5, 6, seed=1, backprop_ticks=2)
+    dense = SRN(6, 5, 6, seed=1, backprop_ticks=2)
+    for num_streams in (1, 3):
+        np.testing.assert_allclose(sparse.train(inputs, targets, num_streams),
+                                   dense.train(np.eye(6)[inputs], np.eye(6)[targets],
+                                               num_streams))
+    for name in sparse.weights:
+        np.testing.assert_allclose(sparse.weights[name], dense.weights[name])
+
+    sparse_result = sparse.test(inputs, targets)
+    dense_result = dense.test(np.eye(6)[inputs], np.eye(6)[targets])
+    np.testing.assert_allclose(sparse_result['error_total'], dense_result['error_total'])
+    np.testing.assert_allclose(sparse_result['out_activations'],
+                               dense_result['out_activations'])
+
+
+@pytest.mark.parametrize('output', ['softmax', 'hierarchical'])
+def test_softmax_rejects_distributed_targets(output):
+    net = SRN(6, 5, 6, output=output, classes=[0, 0, 0, 1, 1, 1])
+    inputs, targets = sequence(20, 6)
+    net.train(inputs, np.eye(6)[targets])
+    multi_hot = np.random.RandomState(0).randint(2, size=(20, 6))
+    with pytest.raises(ValueError):
+        net.train(inputs, multi_hot)
+    with pytest.raises(ValueError):
+        net.test(inputs, multi_hot)
+    with pytest.raises(ValueError):
+        net.test_many([(inputs, multi_hot)])
+
+
+def test_testing_leaves_context_unchanged():
+    inputs, targets = sequence(100, 6)
+    for model in (SRN(6, 5, 6), SRNPopulation([0, 1], 6, 5, 6)):
+        model.train(inputs, targets, num_streams=3)
+        context = model.context.copy()
+        first = model.test(inputs, targets)
+        np.testing.assert_array_equal(model.context, context)
+        # Every test starts from the initial context.
+        second = model.test(inputs, targets)
+        if isinstance(model, SRN):
+            first, second = [first], [second]
+        for a, b in zip(first, second):
+            np.testing.assert_array_equal(a['error_total'], b['error_total'])
@@ -0,0 +1,95 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+import store
+
+
+def make_result(i):
+    return {'name': 'net%d' % i,
+            'seed': i,
+            'distributed': bool(i % 2),
+            'test_errors': 0.5 * i,
+            'test_outputs': np.arange(6, dtype=np.float32).reshape(3, 2) + i,
+            'exp_a_errors': list(np.arange(i + 1.))}
+
+
+def assert_results_equal(actual, expected):
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        assert sorted(a) == sorted(e)
+        for name in e:
+            np.testing.assert_array_equal(a[name], e[name])
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / 'results')
+
+
+def test_write_read(directory):
+    results = [make_result(i) for i in range(4)]
+    store.write(results, directory)
+    assert_results_equal(store.read_results(directory), results)
+    table = store.read_table(directory)
+    assert sorted(table) == ['distributed', 'name', 'seed', 'test_errors']
+    np.testing.assert_array_equal(table['seed'], range(4))
+    assert isinstance(store.read_column(directory, 'test_outputs')[0], np.memmap)
+    assert store.read_schema(directory)['exp_a_errors'] == 'array'
+
+
+def test_append_compact_read(directory):
+    results = [make_result(i) for i in range(12)]
+    for result in results[:10]:
+        store.append(result, directory)
+    # Appended parts are read in the order they were added.
+    np.testing.assert_array_equal(store.read_table(directory)['seed'], range(10))
+
+    store.compact(directory)
+    assert len(store.parts(directory)) == 1
+    store.append(results[10:], directory)
+    assert len(store.parts(directory)) == 2
+    assert_results_equal(store.read_results(directory), results)
+    np.testing.assert_array_equal(store.read_table(directory)['seed'], range(12))
+
+
+def test_missing_values(directory):
+    results = [make_result(0), {'name': 'net1', 'seed': 1}, {'seed': 2, 'lang': 'danish'}]
+    store.append(results[:2], directory)
+    store.append(results[2:], directory)
+    store.compact(directory)
+
+    table = store.read_table(directory)
+    np.testing.assert_array_equal(table['test_errors'], [0., np.nan, np.nan])
+    assert list(table['name']) == ['net0', 'net1', None]
+    assert list(table['lang']) == [None, None, 'danish']
+    # Bools aren't turned into floats.
+    assert list(table['distributed']) == [False, None, None]
+    outputs = store.read_column(directory, 'test_outputs')
+    np.testing.assert_array_equal(outputs[0], results[0]['test_outputs'])
+    assert outputs[1:] == [None, None]
+
+
+def test_empty_store(directory):
+    assert store.parts(directory) == []
+    assert store.read_column(directory, 'name') == []
+    assert store.read_results(directory) == []
+
+
+def _append_many(directory, worker, num_parts=20):
+    for i in range(num_parts):
+        store.append({'worker': worker, 'i': i}, directory)
+
+
+def test_concurrent_appends(directory):
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(4, mp_context=context) as pool:
+        for future in [pool.submit(_append_many, directory, worker) for worker in range(4)]:
+            future.result()
+    table = store.read_table(directory)
+    assert len(store.parts(directory)) == 80
+    for worker in range(4):
+        # Each worker's parts are in the order it appended them.
+        np.testing.assert_array_equal(table['i'][table['worker'] == worker], range(20))
@@ -0,0 +1,21 @@
+import store
+import sweep
+
+
+def test_resume_after_compact(tmp_path):
+    directory = str(tmp_path / 'results')
+    jobs = sweep.make_grid(langs=['english'], seeds=range(3))
+    for job in jobs[:2]:
+        store.append({'name': sweep.job_name(job), 'seed': job['seed']}, directory)
+    store.compact(directory)
+
+    assert sweep.finished_jobs(directory) == {sweep.job_name(job) for job in jobs[:2]}
+    results = sweep.load_results(jobs[::-1], directory)
+    assert [result['seed'] for result in results] == [1, 0]
+
+
+def test_main_passes_network_arguments(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sweep, 'run_sweep', lambda *args, **kwargs: calls.append(kwargs))
+    sweep.main(timings_file='timings.json', backend='numpy')
+    assert calls == [{'timings_file': 'timings.json', 'backend': 'numpy'}]